@@ -1,9 +1,36 @@
 import streamlit as st
 import pandas as pd
-import re
+import numpy as np
 import os
-import json
+import tempfile
+import threading
 import traceback
+import uuid
+from datetime import datetime
+
+from lree_orders.autosave import OrderAutosave
+from lree_orders.bulk import BULK_MATCH_KINDS, bulk_order_rows, match_bulk_entries, parse_bulk_entries, part_rows
+from lree_orders.catalog import (
+    FILTER_ORDER, TEXT_FILTER_COLUMNS, build_facet_index, file_hash, parse_catalog, part_atc, sort_order
+)
+from lree_orders.export import (
+    EXPORT_FORMATS, EXPORT_SCOPES, available_export_formats, export_chunks, write_export
+)
+from lree_orders.feed import StockFeed
+from lree_orders.orders import (
+    ASSET_UNIT_COLUMN, ORDER_STATUSES, ORDER_TRANSIENT_COLUMNS, merge_added_lines, order_frame, order_part_lines,
+    order_spend
+)
+from lree_orders.saved_catalog import latest_saved_catalog, load_saved_catalog, load_saved_facet_index, save_catalog
+from lree_orders.snapshots import atc_history, previous_snapshot_id, record_stock_snapshot, stock_diff
+from lree_orders.store import (
+    ORDERS_DB_FILE, OrderConflictError, archive_current_order, change_versions, count_past_orders, delete_order_lines,
+    delete_past_order, find_serial, init_orders_db, insert_order_lines, load_current_order, load_line_assets,
+    load_past_order_lines, load_reservations, load_spend_totals, past_line_values, query_past_orders,
+    search_past_lines, update_line_assets, update_past_order
+)
+from lree_orders.trace import RerunTrace, frame_bytes
+from lree_orders.validation import refresh_atc, validate_stock
 
 st.set_page_config(layout="wide")
 
@@ -31,112 +58,410 @@ st.sidebar.title("Upload Data")
 uploaded_file = st.sidebar.file_uploader("Upload your CSV file", type="csv")
 
 # --- Constants ---
-CURRENT_ORDER_FILE = "current_order.csv"
-PAST_ORDERS_FILE = "past_orders.json"
-
-# --- Functions to Save and Load Order ---
-def save_current_order():
-    if st.session_state.current_order:
-        pd.DataFrame(st.session_state.current_order).to_csv(CURRENT_ORDER_FILE, index=False)
-
-def load_current_order():
-    if os.path.exists(CURRENT_ORDER_FILE):
-        df = pd.read_csv(CURRENT_ORDER_FILE)
-        # Robustly handle boolean columns
-        for col in ["Approved", "Delivered", "Transferred", "Remove"]:
-            if col not in df.columns:
-                df[col] = False
-            # Fill NaNs before converting to bool to prevent errors
-            df[col] = df[col].fillna(False).astype(bool)
-        
-        # Robustly handle numeric columns
-        for col in ["Quantity", "Price per unit", "ATC"]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-        # Robustly handle string columns to prevent type inference issues
-        for col in ["Hardware DRI", "Part", "1-line Justification"]:
-            if col in df.columns:
-                # Fill NaNs with empty strings and convert to string type
-                df[col] = df[col].fillna('').astype(str)
-
-        return df.to_dict('records')
-    return []
-
-def save_past_orders():
-    with open(PAST_ORDERS_FILE, 'w') as f:
-        json.dump(st.session_state.past_orders, f)
-
-def load_past_orders():
-    if os.path.exists(PAST_ORDERS_FILE):
-        with open(PAST_ORDERS_FILE, 'r') as f:
-            past_orders = json.load(f)
-            for order in past_orders:
-                if 'order' in order:
-                    for item in order['order']:
-                        for col in ["Approved", "Delivered", "Transferred"]:
-                            if col in item:
-                                item[col] = bool(item[col])
-            return past_orders
-    return []
+PAST_ORDERS_PAGE_SIZES = [10, 25, 50]
+DATA_SHEET_PAGE_SIZES = [100, 250, 500, 1000]
+LINE_SEARCH_LIMIT = 1000  # Archived lines shown per line search
+CATALOG_CACHE_ENTRIES = 4  # Distinct uploaded files kept parsed in memory
+STOCK_FEED_DIR = os.environ.get("LREE_STOCK_FEED_DIR", "stock_feed")  # Local stand-in for the Box feed
+STOCK_FEED_POLL_SECONDS = 30
+ORDER_WATCH_SECONDS = 5  # How often a session checks whether other sessions changed any orders
+AUTOSAVE_STATUS_SECONDS = 2  # Refresh interval of the "last saved" note under the order
+MERGE_ADDED_PARTS = True  # Default for adding to an existing line's quantity instead of a duplicate line
+TRACE_FILE = os.environ.get("LREE_TRACE_FILE")  # JSON-lines span log; summarize with `python -m lree_orders trace`
+
+# --- Per-Rerun Instrumentation ---
+# Lives in the session so that spans from widget callbacks, which run before the script, are kept
+if 'trace' not in st.session_state:
+    st.session_state.trace = RerunTrace(uuid.uuid4().hex[:12])
+trace = st.session_state.trace
+trace.begin()
+
+# --- Cached Catalog Resources ---
+# The logic lives in lree_orders; these wrappers share results across reruns and sessions.
+# Catalogs are shared read-only by every session: sessions keep only the file hash and their
+# filter selections, and anything derived for display is a new frame, never an edit in place.
+@st.cache_resource(max_entries=CATALOG_CACHE_ENTRIES, show_spinner="Processing CSV file...")
+def load_catalog(file_hash, _file_bytes):
+    # Cached on the content hash only, so reruns with the same upload skip parsing entirely
+    return parse_catalog(_file_bytes)
+
+@st.cache_resource(max_entries=CATALOG_CACHE_ENTRIES)
+def get_facet_index(file_hash, _df):
+    # A saved index is memory-mapped rather than rebuilt
+    return load_saved_facet_index(file_hash) or build_facet_index(_df)
+
+@st.cache_resource(max_entries=1)
+def get_saved_catalog(file_hash):
+    return load_saved_catalog(file_hash)
+
+@st.cache_resource(max_entries=CATALOG_CACHE_ENTRIES)
+def persist_catalog(file_hash, file_name, _df):
+    # Saved once per file on a worker thread, so the next cold start can skip parsing and indexing
+    threading.Thread(
+        target=save_catalog, args=(file_hash, file_name, _df, get_facet_index(file_hash, _df)),
+        name="save-catalog", daemon=True
+    ).start()
+    return True
+
+@st.cache_resource(max_entries=CATALOG_CACHE_ENTRIES)
+def get_part_atc(file_hash, _df):
+    return part_atc(_df)
+
+@st.cache_resource(max_entries=CATALOG_CACHE_ENTRIES)
+def get_part_rows(file_hash, _df):
+    return part_rows(_df)
+
+@st.cache_resource(max_entries=CATALOG_CACHE_ENTRIES * 4)
+def get_sort_order(file_hash, column, descending, _df):
+    return sort_order(_df, column, descending)
+
+@st.cache_resource
+def get_stock_feed():
+    return StockFeed(STOCK_FEED_DIR, STOCK_FEED_POLL_SECONDS)
+
+@st.cache_resource
+def init_orders_db_once():
+    init_orders_db()
+    return True
+
+def spend_table(totals, dimension, label):
+    # One dimension of load_spend_totals() as a display table, largest spend first
+    rows = totals[totals['dimension'] == dimension].sort_values('total', ascending=False)
+    return rows[['key', 'total', 'lines']].rename(columns={'key': label, 'total': 'Total Unit Cost', 'lines': 'Lines'})
+
+def _ago(moment):
+    seconds = int((datetime.now() - moment).total_seconds())
+    return f"{seconds // 60} min ago" if seconds >= 60 else f"{seconds} s ago"
+
+# --- Current Order Session Model ---
+# The current order is shared by every session. Each session tracks the store's change version
+# its model reflects; a version it did not write itself means another session changed the order.
+# Line edits are written behind by the session's OrderAutosave; adding and removing lines is immediate.
+def _note_order_write(version=None):
+    own = st.session_state.own_order_versions
+    own |= st.session_state.autosave.take_written_versions()
+    if version is not None:
+        own.add(version)
+    while st.session_state.current_order_version + 1 in own:
+        st.session_state.current_order_version += 1
+        own.discard(st.session_state.current_order_version)
+
+def index_order_parts():
+    # Part -> line_id for the current order; rebuilt only when lines or their Parts change
+    st.session_state.order_parts = order_part_lines(st.session_state.current_order)
+
+def reload_current_order():
+    st.session_state.autosave.flush()
+    st.session_state.current_order_version = change_versions()["current_order"]
+    st.session_state.own_order_versions = set()
+    st.session_state.current_order = load_current_order()
+    st.session_state.order_editor_version += 1
+    index_order_parts()
+
+def add_order_lines(rows, merge=True):
+    """Add catalog rows to the current order, filling in default order fields they lack.
+
+    With `merge`, Parts already in the order increase that line's quantity instead.
+    Returns (new lines, merged lines).
+    """
+    increments, items = merge_added_lines(rows, st.session_state.order_parts, merge)
+    model = st.session_state.current_order
+    if increments:
+        quantities = model.loc[list(increments), 'Quantity'] + pd.Series(increments)
+        model.loc[quantities.index, 'Quantity'] = quantities
+        # Queued behind any pending edits to the same lines, so it is written after them
+        st.session_state.autosave.update({line_id: {'Quantity': quantity} for line_id, quantity in quantities.items()})
+        st.session_state.order_editor_version += 1
+    if items:
+        with st.session_state.trace.span("order_save", rows=len(items)):
+            _note_order_write(insert_order_lines(items))
+        added = order_frame(items)
+        st.session_state.current_order = added if model.empty else pd.concat([model, added])
+        index_order_parts()
+    return len(items), len(increments)
+
+def remove_order_lines(line_ids):
+    st.session_state.autosave.discard(line_ids)
+    with st.session_state.trace.span("order_save", rows=len(line_ids)):
+        _note_order_write(delete_order_lines(line_ids))
+    st.session_state.current_order = st.session_state.current_order.drop(index=line_ids)
+    st.session_state.order_editor_version += 1
+    index_order_parts()
+
+def apply_order_edits(editor_key):
+    # data_editor on_change callback: apply only the rows the editor reports as changed
+    delta = st.session_state[editor_key]
+    model = st.session_state.current_order
+    line_ids = model.index
+
+    line_changes = {}
+    for position, values in delta.get('edited_rows', {}).items():
+        line_id = line_ids[int(position)]
+        values = {col: value for col, value in values.items() if col in model.columns}
+        for col, value in values.items():
+            try:
+                model.at[line_id, col] = value
+            except (TypeError, ValueError):
+                # e.g. a fractional quantity typed into an integer column
+                model[col] = model[col].astype(object)
+                model.at[line_id, col] = value
+        # "Remove" ticks and other display-only columns stay in the model and are never written
+        stored = {col: value for col, value in values.items() if col not in ORDER_TRANSIENT_COLUMNS}
+        if stored:
+            line_changes[line_id] = stored
+    if line_changes:
+        st.session_state.autosave.update(line_changes)
+        if any('Part' in values for values in line_changes.values()):
+            index_order_parts()
+
+    deleted = [line_ids[int(position)] for position in delta.get('deleted_rows', [])]
+    if deleted:
+        remove_order_lines(deleted)
+
+    added = delta.get('added_rows', [])
+    if added:
+        # Rows typed into the editor are kept as separate lines, as entered
+        add_order_lines(pd.DataFrame(added).drop(columns=["Status", "Total Unit Cost", "Remove"], errors='ignore'), merge=False)
+
+    # Start the next interaction from an empty delta against the updated model
+    st.session_state.order_editor_version += 1
+
+def make_export(filters, fmt, autosave):
+    # Deferred download data: runs on click, outside the script run, so it touches no session state
+    def export():
+        autosave.flush()  # Pending current-order edits are part of the export
+        with tempfile.TemporaryFile() as out:
+            write_export(export_chunks(**filters), fmt, out)
+            out.seek(0)
+            return out.read()
+    return export
+
+def apply_asset_edits(editor_key, order_id, line_index):
+    # data_editor on_change callback: editor positions are unit indexes, so only edited units are written
+    changes = {int(position): values for position, values in st.session_state[editor_key].get('edited_rows', {}).items()}
+    if changes:
+        with st.session_state.trace.span("asset_save", rows=len(changes)):
+            update_line_assets(order_id, line_index, changes)
+
+@st.fragment(run_every=AUTOSAVE_STATUS_SECONDS)
+def order_save_status():
+    autosave = st.session_state.autosave
+    if autosave.error:
+        st.caption(f":warning: Not saved yet, retrying: {autosave.error}")
+    elif autosave.dirty:
+        st.caption("Saving…")
+    elif autosave.saved_at:
+        st.caption(f"All changes saved {_ago(autosave.saved_at)}.")
 
 # --- Main App Logic ---
-if 'df' not in st.session_state:
-    st.session_state.df = pd.DataFrame()
-if 'current_order' not in st.session_state:
-    st.session_state.current_order = load_current_order()
-if 'past_orders' not in st.session_state:
-    st.session_state.past_orders = load_past_orders()
+init_orders_db_once()
+if 'past_order_lines' not in st.session_state:
+    # order_id -> {"version": ..., "lines": [...]}, filled as orders are opened
+    st.session_state.past_order_lines = {}
 if 'editor_key_version' not in st.session_state:
     st.session_state.editor_key_version = 0
-
+if 'order_editor_version' not in st.session_state:
+    st.session_state.order_editor_version = 0
+if 'autosave' not in st.session_state:
+    st.session_state.autosave = OrderAutosave()
+    st.session_state.own_order_versions = set()
+if 'current_order' not in st.session_state:
+    reload_current_order()
+
+store_versions = change_versions()
+_note_order_write()  # Count autosaves written since the last run as this session's own
+if store_versions["current_order"] != st.session_state.current_order_version:
+    with trace.span("order_load") as span:
+        reload_current_order()
+        span["rows"] = len(st.session_state.current_order)
+# Past orders are re-queried every run; this only tells the watcher below what this run has seen
+st.session_state.past_orders_version = store_versions["past_orders"]
+if 'catalog_hash' not in st.session_state:
+    st.session_state.catalog_hash = None
+if 'catalog_snapshot' not in st.session_state:
+    st.session_state.catalog_snapshot = None
+    st.session_state.catalog_diff = None
+
+def switch_catalog(file_hash, file_name, df):
+    # Only a new distinct file needs to replace the catalog and re-validate the order
+    if file_hash == st.session_state.catalog_hash:
+        return
+    persist_catalog(file_hash, file_name, df)
+    part_atc = get_part_atc(file_hash, df)
+    snapshot_id = record_stock_snapshot(file_hash, file_name, part_atc)
+    session_snapshot = st.session_state.catalog_snapshot
+    st.session_state.catalog_hash = file_hash
+    st.session_state.catalog_snapshot = snapshot_id
+    st.session_state.catalog_diff = stock_diff(previous_snapshot_id(snapshot_id), snapshot_id)
+
+    # --- Re-validate ATC in Current Order ---
+    # Lines were validated against this session's previous file, so only Parts that changed since need a refresh
+    model = st.session_state.current_order
+    if not model.empty and session_snapshot is not None:
+        model_lines = model[model['Part'].isin(stock_diff(session_snapshot, snapshot_id)['Part'])]
+    else:
+        model_lines = model
+    if not model_lines.empty:
+        new_atcs = refresh_atc(model_lines['Part'], part_atc).set_axis(model_lines.index)
+        changed = new_atcs[new_atcs != model_lines['ATC']]
+        model.loc[changed.index, 'ATC'] = changed
+        st.session_state.autosave.update({line_id: {'ATC': atc} for line_id, atc in changed.items()})
+
+stock_feed = get_stock_feed()
+
+@st.fragment(run_every=STOCK_FEED_POLL_SECONDS)
+def stock_feed_status():
+    feed_catalog = stock_feed.latest
+    if feed_catalog is None:
+        st.caption(f"Stock feed: no files in `{STOCK_FEED_DIR}` yet.")
+    else:
+        st.caption(f"Stock feed: {feed_catalog.file_name}, loaded {_ago(feed_catalog.loaded_at)}.")
+        # A newly published feed file reaches every session without a manual upload
+        if uploaded_file is None and feed_catalog.file_hash != st.session_state.catalog_hash:
+            st.rerun(scope="app")
+    if stock_feed.error:
+        st.caption(f":warning: Stock feed error: {stock_feed.error}")
+
+catalog = pd.DataFrame()  # This run's view of the shared catalog for the session's file
 if uploaded_file is not None:
     try:
-        df = pd.read_csv(uploaded_file)
-        if any(col.startswith('Unnamed:') for col in df.columns):
-            df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-        st.session_state.df = df
+        file_bytes = uploaded_file.getvalue()
+        with trace.span("ingest", bytes=len(file_bytes)) as span:
+            upload_hash = file_hash(file_bytes)
+            df = load_catalog(upload_hash, file_bytes)
+            span["rows"] = len(df)
         st.sidebar.success("File uploaded and processed successfully!")
-
-        # --- Re-validate ATC in Current Order ---
-        if st.session_state.current_order:
-            atc_map = df.set_index('Part')['ATC'].to_dict()
-            for item in st.session_state.current_order:
-                item['ATC'] = atc_map.get(item['Part'], 0) # Default to 0 if part no longer exists
-            save_current_order()
+        with trace.span("catalog_switch", rows=len(df)):
+            switch_catalog(upload_hash, uploaded_file.name, df)
+        catalog = df
     except Exception as e:
         st.error(f"Error reading the CSV file: {e}")
         st.stop()
+elif stock_feed.latest is not None:
+    feed_catalog = stock_feed.latest
+    with trace.span("catalog_switch", rows=len(feed_catalog.df)):
+        switch_catalog(feed_catalog.file_hash, feed_catalog.file_name, feed_catalog.df)
+    catalog = feed_catalog.df
+elif latest_saved_catalog() is not None:
+    # Nothing uploaded or fed yet in this process: start from the catalog saved last time
+    saved_hash, saved_name = latest_saved_catalog()
+    with trace.span("catalog_load") as span:
+        saved_df = get_saved_catalog(saved_hash)
+        span["rows"] = 0 if saved_df is None else len(saved_df)
+    if saved_df is not None:
+        st.sidebar.caption(f"Using the last stock file loaded: {saved_name}.")
+        with trace.span("catalog_switch", rows=len(saved_df)):
+            switch_catalog(saved_hash, saved_name, saved_df)
+        catalog = saved_df
+
+@st.fragment(run_every=ORDER_WATCH_SECONDS)
+def order_change_watch():
+    # Reruns the page only when another session changed orders since this session's last run
+    versions = change_versions()
+    _note_order_write()
+    if (versions["current_order"] != st.session_state.current_order_version
+            or versions["past_orders"] != st.session_state.past_orders_version):
+        st.rerun(scope="app")
+
+with st.sidebar:
+    stock_feed_status()
+    order_change_watch()
+
+catalog_diff = st.session_state.catalog_diff
+if catalog_diff is not None:
+    counts = catalog_diff['Change'].value_counts()
+    with st.sidebar.expander(
+        f"Since previous stock file: {counts.get('added', 0)} added, "
+        f"{counts.get('removed', 0)} removed, {counts.get('ATC changed', 0)} ATC changed"
+    ):
+        st.dataframe(catalog_diff, hide_index=True)
 
 
 # Create tabs
 tab1, tab2, tab3, tab4 = st.tabs(["Filtered View", "Data Sheet", "Current Order", "Past Orders"])
 
 with tab1:
-    if st.session_state.df.empty:
+    if catalog.empty:
         st.info("Please upload a CSV file using the sidebar to get started.")
     else:
-        df_filtered = st.session_state.df.copy()
+        with trace.span("facet_index", rows=len(catalog)):
+            facet_index = get_facet_index(st.session_state.catalog_hash, catalog)
+
+        with st.expander("Paste a list of parts"):
+            bulk_text = st.text_area(
+                "One Part number or description per line, with an optional quantity",
+                placeholder="MK1E3B/A\t3\nFRX73D/A, 2\n4 x HomePod mini starlight", key="bulk_text"
+            )
+            if st.button("Match", key="bulk_match", disabled=not bulk_text.strip()):
+                for key in [key for key in st.session_state if str(key).startswith("bulk_choice_")]:
+                    del st.session_state[key]  # Choices belong to the previous match
+                with trace.span("bulk_match") as span:
+                    entries = parse_bulk_entries(bulk_text)
+                    st.session_state.bulk_matches = (st.session_state.catalog_hash, match_bulk_entries(
+                        entries, catalog, get_part_rows(st.session_state.catalog_hash, catalog), facet_index
+                    ))
+                    span["rows"] = len(entries)
+
+            bulk_hash, bulk_matches = st.session_state.get("bulk_matches") or (None, None)
+            if bulk_matches is not None and bulk_hash == st.session_state.catalog_hash:
+                kinds = bulk_matches['Match'].value_counts()
+                st.caption(", ".join(f"{kinds[kind]} {kind.lower()}" for kind in BULK_MATCH_KINDS if kind in kinds))
+
+                def describe_row(row):
+                    if row is None:
+                        return "Skip this entry"
+                    part = catalog.iloc[row]
+                    return f"{part['Part']} — {part.get('Description', '')} (ATC {part['ATC']})"
+
+                # Ambiguous entries default to their best candidate and are confirmed or changed here
+                choices = {}
+                for entry, text, found in bulk_matches.loc[
+                    bulk_matches['Match'] == "Ambiguous", ['Entry', 'Text', 'Candidates']
+                ].itertuples(index=False):
+                    choices[entry] = st.selectbox(
+                        f"Line {entry}: {text}", [*found, None], format_func=describe_row, key=f"bulk_choice_{entry}"
+                    )
+                not_found = bulk_matches.loc[bulk_matches['Match'] == "Not found", 'Text']
+                if not not_found.empty:
+                    st.warning("No match for: " + "; ".join(not_found))
+
+                bulk_rows = bulk_order_rows(catalog, bulk_matches, choices)
+                if not bulk_rows.empty:
+                    # Checked together with what the order already holds of the same Parts
+                    stock_check = validate_stock(
+                        pd.concat([st.session_state.current_order[['Part', 'Quantity', 'ATC']], bulk_rows]),
+                        load_reservations()
+                    )
+                    exceeding = stock_check[stock_check['Exceeds'] & stock_check['Part'].isin(bulk_rows['Part'])]
+                    st.dataframe(
+                        bulk_rows[['Part', 'Description', 'Quantity', 'ATC']].assign(
+                            Available=bulk_rows['Part'].map(stock_check.set_index('Part')['Available']),
+                            Stock=np.where(bulk_rows['Part'].isin(exceeding['Part']), "⚠️ Exceeds Stock", "✅ OK")
+                        ),
+                        hide_index=True
+                    )
+                    if not exceeding.empty:
+                        st.warning(f"{len(exceeding)} Part(s) would exceed available stock together with the current order.")
+                    bulk_merge = st.toggle("Add to lines already in the order", value=MERGE_ADDED_PARTS, key="bulk_merge")
+                    if st.button(f"Add {len(bulk_rows)} Line(s) to Order", type="primary", key="bulk_add"):
+                        added_count, merged_count = add_order_lines(bulk_rows, merge=bulk_merge)
+                        st.session_state.bulk_matches = None
+                        st.success(f"Added {added_count} item(s) to current order"
+                                   + (f" and increased the quantity of {merged_count} line(s)." if merged_count else "."))
+                        st.rerun()
 
         st.header("Column Filters")
 
         # --- Guided, Sequential, Multi-Select Filtering ---
-        
-        filter_order = [
-            "Product Family Code",
-            "Product Description",
-            "Description",
-            "Subclass Desc",
-            "Subfamily Desc",
-            "Country/Region",
-            "Part"
-        ]
 
         # Filter out columns that are not in the dataframe
-        filter_order = [col for col in filter_order if col in df_filtered.columns]
+        filter_order = [col for col in FILTER_ORDER if col in catalog.columns]
         
         filter_cols = st.columns(len(filter_order))
 
+        # Each applied filter becomes a (column, kind, values) step resolved by the facet index
+        filter_steps = []
+
         for i, column in enumerate(filter_order):
             with filter_cols[i]:
                 is_active = i == 0
@@ -148,29 +473,36 @@ with tab1:
                         st.session_state.get(f"multiselect_{prev_col}")):
                         is_active = True
 
-                unique_values = df_filtered[column].dropna().unique()
-                
                 if is_active:
-                    if column in ["Product Description", "Description"]:
+                    unique_values = facet_index.options(column, filter_steps)
+                    if column in TEXT_FILTER_COLUMNS:
                         filter_mode = st.selectbox(f"Filter {column} by:", ["Search by Text", "Select from List"], key=f"mode_{column}")
                         if filter_mode == "Search by Text":
                             search_term = st.text_input(f"Search {column}", key=f"search_{column}")
                             if search_term:
-                                df_filtered = df_filtered[df_filtered[column].str.contains(search_term, case=False, na=False)]
+                                filter_steps.append((column, "search", search_term))
                         else:
-                            selected_values = st.multiselect(f"Select {column} values", list(unique_values), key=f"multiselect_{column}")
+                            selected_values = st.multiselect(f"Select {column} values", unique_values, key=f"multiselect_{column}")
                             if selected_values:
-                                df_filtered = df_filtered[df_filtered[column].isin(selected_values)]
+                                filter_steps.append((column, "values", tuple(selected_values)))
                     else:
-                        selected_values = st.multiselect(f"By {column}", list(unique_values), key=f"filter_{column}")
+                        selected_values = st.multiselect(f"By {column}", unique_values, key=f"filter_{column}")
                         if selected_values:
-                            df_filtered = df_filtered[df_filtered[column].isin(selected_values)]
+                            filter_steps.append((column, "values", tuple(selected_values)))
                 else:
-                    if column in ["Product Description", "Description"]:
+                    if column in TEXT_FILTER_COLUMNS:
                         st.selectbox(f"Filter {column} by:", ["Search by Text", "Select from List"], disabled=True, key=f"mode_{column}")
                     else:
                         st.multiselect(f"By {column}", [], disabled=True, key=f"filter_{column}")
 
+        with trace.span("filter_rows") as span:
+            filtered_rows = facet_index.rank(filter_steps)
+            if filtered_rows is None:
+                df_filtered = catalog.copy(deep=False)
+            else:
+                df_filtered = catalog.iloc[filtered_rows]
+            span["rows"] = len(df_filtered)
+
         # --- Display Filtered Data with Row Selection ---
         st.header("Filtered Data")
         
@@ -178,35 +510,27 @@ with tab1:
         df_filtered.insert(0, "Select", False)
 
         # Use data_editor to display the dataframe with checkboxes
-        edited_df = st.data_editor(
-            df_filtered,
-            hide_index=True,
-            column_config={"Select": st.column_config.CheckboxColumn(required=True)},
-            disabled=df_filtered.columns.drop("Select"),
-            key=f"data_editor_{st.session_state.editor_key_version}"
-        )
+        with trace.span("filtered_editor", rows=len(df_filtered), bytes=frame_bytes(df_filtered)):
+            edited_df = st.data_editor(
+                df_filtered,
+                hide_index=True,
+                column_config={"Select": st.column_config.CheckboxColumn(required=True)},
+                disabled=df_filtered.columns.drop("Select"),
+                key=f"data_editor_{st.session_state.editor_key_version}"
+            )
 
         selected_rows = edited_df[edited_df.Select]
 
         if not selected_rows.empty:
             col1, col2 = st.columns(2)
             with col1:
+                merge_parts = st.toggle("Add to lines already in the order", value=MERGE_ADDED_PARTS, key="merge_added_parts")
                 if st.button("Add Selected to Order", type="primary"):
                     # Get the selected rows without the "Select" column
                     rows_to_add = selected_rows.drop(columns=["Select"])
-                    for index, row in rows_to_add.iterrows():
-                        row_dict = row.to_dict()
-                        row_dict['Quantity'] = 1
-                        row_dict['Price per unit'] = 0.0
-                        row_dict['Hardware DRI'] = ""
-                        row_dict['Location'] = "Cork"
-                        row_dict['1-line Justification'] = ""
-                        row_dict['Approved'] = False
-                        row_dict['Delivered'] = False
-                        row_dict['Transferred'] = False
-                        st.session_state.current_order.append(row_dict)
-                    save_current_order()
-                    st.success(f"Added {len(rows_to_add)} item(s) to current order.")
+                    added_count, merged_count = add_order_lines(rows_to_add, merge=merge_parts)
+                    st.success(f"Added {added_count} item(s) to current order"
+                               + (f" and increased the quantity of {merged_count} line(s)." if merged_count else "."))
                     # Increment the key version to force a reset of the data_editor
                     st.session_state.editor_key_version += 1
                     st.rerun()
@@ -218,78 +542,97 @@ with tab1:
 
 with tab2:
     st.header("Original Data")
-    if st.session_state.df.empty:
+    if catalog.empty:
         st.info("Please upload a CSV file to see the full data sheet.")
     else:
-        st.dataframe(st.session_state.df)
+
+        # Only the visible window is sent to the browser; sorting and projection happen here
+        sheet_col1, sheet_col2, sheet_col3, sheet_col4 = st.columns([3, 2, 1, 1])
+        with sheet_col1:
+            sheet_columns = st.multiselect("Columns", list(catalog.columns), default=list(catalog.columns), key="sheet_columns")
+        with sheet_col2:
+            sort_column = st.selectbox("Sort by", [None, *catalog.columns], format_func=lambda col: "Original order" if col is None else col, key="sheet_sort")
+        with sheet_col3:
+            sort_descending = st.toggle("Descending", key="sheet_descending", disabled=sort_column is None)
+        with sheet_col4:
+            sheet_page_size = st.selectbox("Rows per page", DATA_SHEET_PAGE_SIZES, key="sheet_page_size")
+
+        sheet_page_count = max(1, (len(catalog) - 1) // sheet_page_size + 1)
+        sheet_page = st.number_input(f"Page (of {sheet_page_count})", min_value=1, max_value=sheet_page_count, value=1, key="sheet_page")
+        window_start = (sheet_page - 1) * sheet_page_size
+        window_end = min(window_start + sheet_page_size, len(catalog))
+
+        with trace.span("data_sheet", rows=window_end - window_start) as span:
+            if sort_column is None:
+                window = catalog.iloc[window_start:window_end]
+            else:
+                sheet_order = get_sort_order(st.session_state.catalog_hash, sort_column, sort_descending, catalog)
+                window = catalog.iloc[sheet_order[window_start:window_end]]
+            window = window[sheet_columns or list(catalog.columns)]
+            span["bytes"] = frame_bytes(window)
+            st.dataframe(window, hide_index=True)
+        st.caption(f"Rows {window_start + 1:,}–{window_end:,} of {len(catalog):,}")
+
+        # --- ATC history across every stock file ingested so far ---
+        st.header("ATC History")
+        # Typed rather than picked, so the Part list is never sent to the browser
+        history_part = st.text_input("Part", placeholder="e.g. MK1E3B/A", key="history_part").strip()
+        if history_part:
+            history = atc_history(history_part)
+            if history.notna().any():
+                st.line_chart(history)
+            else:
+                st.info(f"No stock file has recorded an ATC for Part '{history_part}'.")
 
 with tab3:
     st.header("Price Summary")
-    if st.session_state.current_order:
-        order_df = pd.DataFrame(st.session_state.current_order)
-        
-        # Ensure required columns for calculations exist to prevent errors
-        for col, default in [('Quantity', 1), ('Price per unit', 0.0), ('Location', 'N/A')]:
-            if col not in order_df.columns:
-                order_df[col] = default
+    model = st.session_state.current_order
+    # Summed once per run from the model, which holds edits still waiting for autosave; Past Orders reuses it
+    current_spend = order_spend(model)
+    if not model.empty:
+        line_costs = (model['Quantity'] * model['Price per unit']).rename('Total Unit Cost')
+        total_price = current_spend.loc[current_spend['dimension'] == 'total', 'total'].sum()
 
-        order_df['Total Unit Cost'] = order_df['Quantity'] * order_df['Price per unit']
-        total_price = order_df['Total Unit Cost'].sum()
-        
         with st.expander(f"Total Price: ${total_price:,.2f}"):
-            location_summary = order_df.groupby('Location')['Total Unit Cost'].sum().reset_index()
             st.dataframe(
-                location_summary.style.format({"Total Unit Cost": "${:,.2f}"}),
+                spend_table(current_spend, 'location', 'Location').drop(columns='Lines')
+                    .style.format({"Total Unit Cost": "${:,.2f}"}),
                 hide_index=True,
                 use_container_width=True
             )
 
         st.header("Current Order")
         try:
-            # --- Real-time Stock Validation (only if main df is loaded and required columns exist) ---
-            if not st.session_state.df.empty and 'ATC' in order_df.columns and 'Part' in order_df.columns:
-                
-                # Dynamically build the aggregation dictionary based on available columns
-                agg_dict = {}
-                if 'Quantity' in order_df.columns:
-                    agg_dict['Quantity'] = 'sum'
-                if 'ATC' in order_df.columns:
-                    agg_dict['ATC'] = 'first'
-                if 'Description' in order_df.columns:
-                    agg_dict['Description'] = 'first'
-
-                # Only proceed if we have the necessary columns to check stock
-                if 'Quantity' in agg_dict and 'ATC' in agg_dict:
-                    order_summary = order_df.groupby('Part').agg(agg_dict).reset_index()
-
-                    problematic_parts = [
-                        row['Part'] for index, row in order_summary.iterrows()
-                        if row['Quantity'] > row['ATC']
-                    ]
-                    
-                    order_df['Status'] = order_df['Part'].apply(lambda x: "⚠️ Exceeds Stock" if x in problematic_parts else "✅ OK")
-                    
-                    if problematic_parts and 'Description' in order_summary.columns:
-                        stock_errors = [
-                            f"<li>{row.get('Description', 'N/A')} (Part: {row['Part']}): Total Quantity ({row['Quantity']}) exceeds stock ({row['ATC']})</li>"
-                            for index, row in order_summary.iterrows() if row['Part'] in problematic_parts
-                        ]
-                        error_message = "<b>Stock Errors:</b><ul>" + "".join(stock_errors) + "</ul>"
-                        st.markdown(f":warning: {error_message}", unsafe_allow_html=True)
-
             # --- Define Display and Configuration ---
             display_cols = [
-                "Status", "Description", "Part", "ATC", "Quantity", "Price per unit",
+                "Remove", "Status", "Description", "Part", "ATC", "Quantity", "Price per unit",
                 "Total Unit Cost", "Hardware DRI", "Location", "1-line Justification",
                 "Approved", "Delivered", "Transferred"
             ]
-            
-            # Filter display columns to only those that actually exist in the DataFrame
-            final_display_cols = [col for col in display_cols if col in order_df.columns]
-            order_df = order_df[final_display_cols]
 
-            # Add a "Remove" column for editing
-            order_df.insert(0, "Remove", False)
+            # Project the model onto the displayed columns; computed columns are added to this view only
+            order_df = model[[col for col in display_cols if col in model.columns]]
+            order_df.insert(order_df.columns.get_loc("Price per unit") + 1, "Total Unit Cost", line_costs)
+
+            # --- Real-time Stock Validation (only if main df is loaded) ---
+            if not catalog.empty:
+                
+                with trace.span("stock_validation", rows=len(model)):
+                    stock_summary = validate_stock(model, load_reservations())
+                exceeding = stock_summary[stock_summary['Exceeds']]
+
+                order_df.insert(1, 'Status', np.where(
+                    model['Part'].isin(exceeding['Part']), "⚠️ Exceeds Stock", "✅ OK"
+                ))
+
+                if not exceeding.empty:
+                    stock_errors = [
+                        f"<li>{row.get('Description', 'N/A')} (Part: {row['Part']}): Total Quantity ({row['Requested']}) "
+                        f"exceeds available stock ({row['Available']} = ATC {row['ATC']} − {row['Reserved']} reserved by past orders)</li>"
+                        for row in exceeding.to_dict('records')
+                    ]
+                    error_message = "<b>Stock Errors:</b><ul>" + "".join(stock_errors) + "</ul>"
+                    st.markdown(f":warning: {error_message}", unsafe_allow_html=True)
 
             # --- Dynamic Column Configuration ---
             existing_locations = []
@@ -317,42 +660,65 @@ with tab3:
                 k: v for k, v in full_column_config.items() if k in order_df.columns or k == "Remove"
             }
 
-            # When the data_editor is changed, its output is the new, edited DataFrame.
-            # We immediately save this back to the session state to make the change persistent.
-            edited_order_df = st.data_editor(
-                order_df,
-                column_config=active_column_config,
-                hide_index=True,
-                key="order_editor"
-            )
-            
-            # Update the session state immediately after an edit
-            st.session_state.current_order = edited_order_df.to_dict('records')
+            # The editor reports per-row deltas, which apply_order_edits() writes to the
+            # order model and the store; nothing is rebuilt from the editor's output.
+            order_editor_key = f"order_editor_{st.session_state.order_editor_version}"
+            with trace.span("order_editor", rows=len(order_df), bytes=frame_bytes(order_df)):
+                st.data_editor(
+                    order_df.reset_index(drop=True),  # Editor positions line up with the model's line order
+                    column_config=active_column_config,
+                    disabled=["Status", "Total Unit Cost"],
+                    hide_index=True,
+                    num_rows="dynamic",
+                    key=order_editor_key,
+                    on_change=apply_order_edits,
+                    args=(order_editor_key,)
+                )
 
             # --- Action Buttons ---
             col1, col2, col3 = st.columns(3)
             with col1:
                 if st.button("Remove Selected from Order"):
-                    rows_to_keep = [row for row in st.session_state.current_order if not row['Remove']]
-                    st.session_state.current_order = rows_to_keep
-                    save_current_order()
+                    remove_order_lines(model.index[model['Remove']].tolist())
                     st.rerun()
             with col2:
-                if st.button("Save Changes to CSV", type="primary"):
-                    save_current_order()
-                    st.success("Order saved to current_order.csv!")
+                if st.button("Save Changes", type="primary"):
+                    # Edits save themselves shortly after they are made; this writes any still
+                    # waiting right away and re-reads the stored order
+                    with trace.span("order_save"):
+                        st.session_state.autosave.flush()
+                    with trace.span("order_load") as span:
+                        reload_current_order()
+                        span["rows"] = len(st.session_state.current_order)
+                    st.success(f"Order saved to {ORDERS_DB_FILE}!")
+            with col3:
+                order_save_status()
 
             st.header("Archive Order")
             archive_name = st.text_input("Enter a name for this order:")
             if st.button("Archive this Order", type="primary"):
                 if archive_name:
-                    st.session_state.past_orders.append({"name": archive_name, "order": st.session_state.current_order})
-                    save_past_orders()
-                    st.session_state.current_order = []
-                    if os.path.exists(CURRENT_ORDER_FILE):
-                        os.remove(CURRENT_ORDER_FILE)
-                    st.success(f"Order '{archive_name}' archived successfully!")
-                    st.rerun()
+                    # The stored order is archived and cleared in one transaction, and only if no other
+                    # session changed it since this one loaded it, so their lines are never lost unseen
+                    with trace.span("order_archive", rows=len(model)):
+                        st.session_state.autosave.flush()
+                        _note_order_write()
+                        try:
+                            _, version = archive_current_order(
+                                archive_name, expected_version=st.session_state.current_order_version
+                            )
+                        except OrderConflictError:
+                            version = None
+                    if version is None:
+                        reload_current_order()
+                        st.warning("The order was changed by another session and has been reloaded. "
+                                   "Review it, then archive again.")
+                    else:
+                        st.session_state.current_order = order_frame([])
+                        index_order_parts()
+                        _note_order_write(version)
+                        st.success(f"Order '{archive_name}' archived successfully!")
+                        st.rerun()
                 else:
                     st.warning("Please enter a name for the order before archiving.")
         except Exception as e:
@@ -364,31 +730,228 @@ with tab3:
 
 with tab4:
     st.header("Past Orders")
-    if st.session_state.past_orders:
-        for i, order_data in enumerate(st.session_state.past_orders):
-            with st.expander(order_data["name"]):
-                past_order_df = pd.DataFrame(order_data["order"])
-                edited_past_order_df = st.data_editor(
-                    past_order_df,
+    with st.expander("Spend across all orders"):
+        archive_spend = load_spend_totals("archive")
+        metric_col1, metric_col2 = st.columns(2)
+        metric_col1.metric("Archived orders", f"${archive_spend.loc[archive_spend['dimension'] == 'total', 'total'].sum():,.2f}")
+        metric_col2.metric("Current order", f"${current_spend.loc[current_spend['dimension'] == 'total', 'total'].sum():,.2f}")
+        spend_cols = st.columns(3)
+        for spend_col, (dimension, label) in zip(spend_cols, [("location", "Location"), ("status", "Status"), ("family", "Product Family")]):
+            spend_col.dataframe(
+                spend_table(archive_spend, dimension, label),
+                column_config={"Total Unit Cost": st.column_config.NumberColumn(format="$%.2f")},
+                hide_index=True
+            )
+
+    with st.expander("Find lines across all orders"):
+        search_col1, search_col2, search_col3, search_col4 = st.columns(4)
+        with search_col1:
+            part_query = st.text_input("Parts", placeholder="e.g. FRX73D/A, MK1E3B/A", key="line_search_parts")
+        with search_col2:
+            dri_query = st.multiselect("Hardware DRI", past_line_values("hardware_dri"), key="line_search_dris")
+        with search_col3:
+            location_query = st.multiselect("Location", past_line_values("location"), key="line_search_locations")
+        with search_col4:
+            line_status_query = st.multiselect("Line status", ORDER_STATUSES, key="line_search_statuses")
+        line_search = {
+            "parts": [part.strip() for part in part_query.replace(",", " ").split() if part.strip()],
+            "hardware_dris": dri_query, "locations": location_query, "statuses": line_status_query,
+        }
+        if any(line_search.values()):
+            with trace.span("past_line_search") as span:
+                matched_count, matched_lines = search_past_lines(**line_search, limit=LINE_SEARCH_LIMIT)
+                span["rows"] = matched_count
+            st.caption(f"{matched_count:,} matching line(s)"
+                       + (f", showing the newest {LINE_SEARCH_LIMIT:,}." if matched_count > LINE_SEARCH_LIMIT else "."))
+            st.dataframe(matched_lines.drop(columns="order_id"), hide_index=True)
+
+    with st.expander("Export order lines"):
+        export_col1, export_col2, export_col3, export_col4, export_col5 = st.columns(5)
+        with export_col1:
+            export_scope = st.selectbox("Orders", EXPORT_SCOPES, format_func=str.capitalize, key="export_scope")
+        with export_col2:
+            export_dates = st.date_input("Archived between", value=(), key="export_dates")
+        with export_col3:
+            export_locations = st.multiselect("Location", past_line_values("location"), key="export_locations")
+        with export_col4:
+            export_statuses = st.multiselect("Line status", ORDER_STATUSES, key="export_statuses")
+        with export_col5:
+            # Formats whose optional package is missing are not offered
+            export_format = st.selectbox("Format", available_export_formats(), format_func=str.upper, key="export_format")
+        export_filters = {
+            "scope": export_scope,
+            "date_from": export_dates[0] if len(export_dates) > 0 else None,
+            "date_to": export_dates[-1] if len(export_dates) > 0 else None,
+            "locations": export_locations, "statuses": export_statuses,
+        }
+        # The export only runs when the button is clicked, not on every rerun
+        st.download_button(
+            "Download", data=make_export(export_filters, export_format, st.session_state.autosave),
+            file_name=f"order_lines_{datetime.now():%Y%m%d}.{export_format}",
+            mime=EXPORT_FORMATS[export_format], on_click="ignore", key="export_download"
+        )
+
+    serial_query = st.text_input("Find serial number", key="serial_query")
+    if serial_query:
+        serial_units = find_serial(serial_query)
+        if serial_units:
+            st.dataframe(pd.DataFrame([{
+                "Order": unit["name"],
+                "Part": unit["part"],
+                "Description": unit["description"],
+                "Unit": f"{unit['line_index'] + 1}.{unit['unit_index'] + 1}",
+                "Received": unit["received"],
+                "Current Owner": unit["current_owner"],
+            } for unit in serial_units]), hide_index=True)
+        else:
+            st.info(f"No archived unit has S/N '{serial_query}'.")
+
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([2, 2, 2, 1])
+    with filter_col1:
+        name_filter = st.text_input("Order name contains", key="past_name_filter")
+    with filter_col2:
+        date_range = st.date_input("Archived between", value=(), key="past_date_filter")
+    with filter_col3:
+        status_filter = st.multiselect("Status", ORDER_STATUSES, key="past_status_filter")
+    with filter_col4:
+        page_size = st.selectbox("Per page", PAST_ORDERS_PAGE_SIZES, key="past_page_size")
+
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+    past_filters = {"name": name_filter, "date_from": date_from, "date_to": date_to, "statuses": status_filter}
+    with trace.span("past_orders_query") as span:
+        matching_orders = count_past_orders(**past_filters)
+        span["rows"] = matching_orders
+
+    if matching_orders:
+        page_count = (matching_orders - 1) // page_size + 1
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key="past_page")
+        page_orders = query_past_orders(page_size, (page - 1) * page_size, **past_filters)
+
+        # --- Order List (manifest summaries only) ---
+        st.dataframe(
+            pd.DataFrame([{
+                "Name": entry["name"],
+                "Archived": entry["archived_at"] or "",
+                "Items": entry["item_count"],
+                "Total": entry["total"],
+                "Status": entry["status"],
+                "By Location": ", ".join(f"{loc}: ${amount:,.2f}" for loc, amount in entry["location_totals"].items()),
+            } for entry in page_orders]),
+            column_config={"Total": st.column_config.NumberColumn(format="$%.2f")},
+            hide_index=True,
+            use_container_width=True
+        )
+
+        # --- Opened Order (the only one whose line items are materialized) ---
+        orders_on_page = {entry["order_id"]: entry for entry in page_orders}
+        order_id = st.selectbox(
+            "Open order", [None, *orders_on_page],
+            format_func=lambda oid: "Select an order..." if oid is None else orders_on_page[oid]["name"],
+            key=f"past_open_{page}"
+        )
+        if order_id is not None:
+            order_data = orders_on_page[order_id]
+            st.subheader(order_data["name"])
+            if order_data["location_totals"]:
+                st.dataframe(
+                    pd.DataFrame(list(order_data["location_totals"].items()), columns=["Location", "Total Unit Cost"])
+                        .style.format({"Total Unit Cost": "${:,.2f}"}),
+                    hide_index=True
+                )
+            opened = st.session_state.past_order_lines.get(order_id)
+            if opened is not None and opened["version"] != order_data["version"]:
+                # Saved by another session since it was opened here: pick up their version unless
+                # that would throw away unsaved edits, which Update will then refuse as a conflict
+                pending = st.session_state.get(f"past_order_editor_{order_id}_{opened['version']}") or {}
+                if pending.get("edited_rows"):
+                    st.warning("This order was changed in another session since you opened it.")
+                    if st.button("Discard my edits and load theirs", key=f"reload_{order_id}"):
+                        opened = None
+                else:
+                    opened = None
+            if opened is None:
+                with trace.span("past_order_load") as span:
+                    opened = {"version": order_data["version"], "lines": load_past_order_lines(order_id)}
+                    st.session_state.past_order_lines[order_id] = opened
+                    span["rows"] = len(opened["lines"])
+            past_order_df = pd.DataFrame(opened["lines"])
+            edited_past_order_df = st.data_editor(
+                past_order_df,
+                column_config={
+                    "Approved": st.column_config.CheckboxColumn(required=True),
+                    "Delivered": st.column_config.CheckboxColumn(required=True),
+                    "Transferred": st.column_config.CheckboxColumn(required=True)
+                },
+                hide_index=True,
+                key=f"past_order_editor_{order_id}_{opened['version']}"
+            )
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Update this Order", key=f"update_{order_id}", type="primary"):
+                    items = edited_past_order_df.to_dict('records')
+                    try:
+                        with trace.span("past_order_save", rows=len(items)):
+                            entry = update_past_order(order_id, items, expected_version=opened["version"])
+                        st.session_state.past_order_lines[order_id] = {"version": entry["version"], "lines": items}
+                        st.success(f"Order '{order_data['name']}' updated.")
+                    except OrderConflictError:
+                        st.session_state.past_order_lines.pop(order_id, None)
+                        st.error(f"Order '{order_data['name']}' was changed in another session since you opened it, "
+                                 "so your edits were not saved. Their version is shown after the next refresh.")
+            with col2:
+                if st.button("Delete this Order", key=f"delete_{order_id}"):
+                    try:
+                        delete_past_order(order_id, expected_version=opened["version"])
+                        st.session_state.past_order_lines.pop(order_id, None)
+                        st.rerun()
+                    except OrderConflictError:
+                        st.session_state.past_order_lines.pop(order_id, None)
+                        st.error(f"Order '{order_data['name']}' was changed in another session since you opened it "
+                                 "and was not deleted. Review their changes first.")
+
+            # --- Asset Tracking: units are expanded for one line at a time ---
+            order_lines = opened["lines"]
+            line_index = st.selectbox(
+                "Track units of line", [None, *range(len(order_lines))],
+                format_func=lambda i: "Select a line..." if i is None else
+                    f"{i + 1}. {order_lines[i].get('Part')} – {order_lines[i].get('Description')} "
+                    f"(× {order_lines[i].get(ASSET_UNIT_COLUMN) or 0})",
+                key=f"asset_line_{order_id}"
+            )
+            if line_index is not None:
+                units = int(order_lines[line_index].get(ASSET_UNIT_COLUMN) or 0)
+                asset_editor_key = f"asset_editor_{order_id}_{line_index}"
+                st.data_editor(
+                    load_line_assets(order_id, line_index, units),
                     column_config={
-                        "Approved": st.column_config.CheckboxColumn(required=True),
-                        "Delivered": st.column_config.CheckboxColumn(required=True),
-                        "Transferred": st.column_config.CheckboxColumn(required=True)
+                        "Unit": st.column_config.NumberColumn(disabled=True),
+                        "S/N": st.column_config.TextColumn(),
+                        "Received": st.column_config.CheckboxColumn(required=True),
+                        "Current Owner": st.column_config.TextColumn(),
                     },
                     hide_index=True,
-                    key=f"past_order_editor_{i}"
+                    key=asset_editor_key,
+                    on_change=apply_asset_edits,
+                    args=(asset_editor_key, order_id, line_index)
                 )
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Update this Order", key=f"update_{i}", type="primary"):
-                        st.session_state.past_orders[i]["order"] = edited_past_order_df.to_dict('records')
-                        save_past_orders()
-                        st.success(f"Order '{order_data['name']}' updated.")
-                with col2:
-                    if st.button("Delete this Order", key=f"delete_{i}"):
-                        st.session_state.past_orders.pop(i)
-                        save_past_orders()
-                        st.rerun()
+    elif name_filter or date_range or status_filter:
+        st.info("No past orders match these filters.")
     else:
         st.info("You have no past orders.")
+
+# --- Timing Panel ---
+# Shows the previous completed rerun, since this one is still being measured
+with st.sidebar:
+    if st.toggle("Show timings", key="show_timings") and trace.last is not None:
+        last_spans = (pd.DataFrame(trace.last["spans"]).reindex(columns=["stage", "seconds", "rows", "bytes"])
+                      .astype({"rows": "Int64", "bytes": "Int64"}))
+        st.dataframe(
+            last_spans.assign(ms=last_spans.pop('seconds') * 1000),
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+            hide_index=True
+        )
+        if TRACE_FILE:
+            st.caption(f"Appending to `{TRACE_FILE}`.")
+trace.finish(TRACE_FILE)
@@ -0,0 +1 @@
+"""Scaling benchmarks for lree_orders: ``python -m benchmarks.run --help``."""
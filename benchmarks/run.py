@@ -0,0 +1,161 @@
+"""Time the app's hot paths on synthetic data and write the results as JSON.
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --output bench_results.json
+
+Each measurement is the best of --repeat runs. Results carry the git
+revision and library versions so files from two versions can be diffed.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from lree_orders import store
+from lree_orders.bulk import match_bulk_entries, parse_bulk_entries, part_rows
+from lree_orders.catalog import FILTER_ORDER, TEXT_FILTER_COLUMNS, SearchIndex, build_facet_index, parse_catalog
+from lree_orders.validation import validate_stock
+
+from .synthetic import order_items, stock_csv_bytes
+
+def best_of(fn, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+class Recorder:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def time(self, stage, fn, setup=None, **params):
+        seconds = best_of(fn, self.repeat, setup)
+        self.results.append({"stage": stage, **params, "seconds": seconds})
+        print(f"{stage:<32} {json.dumps(params):<48} {seconds * 1000:10.2f} ms", file=sys.stderr)
+
+def bench_catalog(rec, rows):
+    file_bytes = stock_csv_bytes(rows)
+    rec.time("ingest", lambda: parse_catalog(file_bytes), rows=rows, bytes=len(file_bytes))
+    catalog = parse_catalog(file_bytes)
+    rec.time("facet_index_build", lambda: build_facet_index(catalog), rows=rows)
+    facet_index = build_facet_index(catalog)
+    search_columns = [col for col in TEXT_FILTER_COLUMNS if col in facet_index.values]
+    rec.time("search_index_build", lambda: SearchIndex.build(facet_index, search_columns), rows=rows)
+
+    # Walk the cascade the way a user does: pick the first offered value at each stage.
+    # Each timed step starts with only its prefix memoized, as after changing the last filter.
+    steps = []
+    for column in [col for col in FILTER_ORDER if col in catalog.columns]:
+        options = facet_index.options(column, steps)
+        if not options:
+            break
+        step = (column, "values", (options[0],))
+        prefix = tuple(steps)
+
+        def reset(prefix=prefix):
+            facet_index._memo.clear()
+            facet_index.rows(prefix)
+        rec.time("cascade_step", lambda step=step, prefix=prefix: facet_index.rows((*prefix, step)),
+                 setup=reset, rows=rows, column=column)
+        steps.append(step)
+
+    for query in ["mbp", "iphone 13", "rfb mac 14 sl", '"sl/512gb"']:
+        rec.time("text_search", lambda query=query: facet_index.search.match("Description", query),
+                 setup=facet_index.search._memo.clear, rows=rows, query=query)
+
+    # A pasted 50-line order: half Part numbers, half descriptions
+    part_index = part_rows(catalog)
+    pasted = "\n".join([*(f"{part}\t2" for part in catalog['Part'].iloc[::max(1, rows // 25)][:25]),
+                        *(f"3 x {text}" for text in catalog['Description'].iloc[1::max(1, rows // 25)][:25])])
+    entries = parse_bulk_entries(pasted)
+    rec.time("bulk_match", lambda: match_bulk_entries(entries, catalog, part_index, facet_index),
+             setup=facet_index.search._memo.clear, rows=rows, entries=len(entries))
+    return catalog
+
+def bench_orders(rec, catalog, order_sizes, archive_sizes, workdir):
+    store.ORDERS_DB_FILE = str(Path(workdir) / f"bench_{len(catalog)}.db")
+    store.init_orders_db()
+    reserved = store.load_reservations()
+
+    for lines in order_sizes:
+        items = order_items(catalog, lines)
+        order_df = pd.DataFrame(items)
+        rec.time("validate_stock", lambda: validate_stock(order_df, reserved), rows=len(catalog), lines=lines)
+        rec.time("insert_order_lines", lambda: store.insert_order_lines([dict(item) for item in items]),
+                 setup=store.clear_current_order, lines=lines)
+        line_id = store.load_current_order().index[0]
+        rec.time("update_order_line", lambda: store.update_order_lines({line_id: {"Quantity": 3}}), lines=lines)
+        rec.time("load_current_order", store.load_current_order, lines=lines)
+        store.clear_current_order()
+
+    rng = np.random.default_rng(1)
+    for orders in archive_sizes:
+        store.ORDERS_DB_FILE = str(Path(workdir) / f"bench_archive_{len(catalog)}_{orders}.db")
+        store.init_orders_db()
+        archive = [order_items(catalog, int(rng.integers(5, 60)), seed=k) for k in range(orders)]
+        start = time.perf_counter()
+        for k, items in enumerate(archive):
+            store.archive_order(f"Order {k}", items)
+        rec.results.append({"stage": "archive_order_bulk", "orders": orders,
+                            "seconds": time.perf_counter() - start})
+        middle = orders // 2 + 1
+        rec.time("archive_order", lambda: store.delete_past_order(store.archive_order("extra", archive[0])["order_id"]),
+                 orders=orders)
+        rec.time("update_past_order", lambda: store.update_past_order(middle, archive[middle - 1]), orders=orders)
+        rec.time("query_past_orders_page", lambda: (store.count_past_orders(), store.query_past_orders(25)),
+                 orders=orders)
+        rec.time("load_past_order_lines", lambda: store.load_past_order_lines(middle), orders=orders)
+        rec.time("load_reservations", store.load_reservations, orders=orders)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Catalog row counts (up to 1000000)")
+    parser.add_argument("--order-lines", type=int, nargs="+", default=[10, 100, 1_000])
+    parser.add_argument("--archive-orders", type=int, nargs="+", default=[100, 1_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="-", help="JSON results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    rec = Recorder(args.repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            catalog = bench_catalog(rec, rows)
+            bench_orders(rec, catalog, args.order_lines, args.archive_orders if rows == args.sizes[0] else [], workdir)
+
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "repeat": args.repeat,
+        "results": rec.results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
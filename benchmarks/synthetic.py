@@ -0,0 +1,67 @@
+"""Synthetic stock files, orders and archives shaped like the refurb stock CSV."""
+import numpy as np
+import pandas as pd
+
+from lree_orders.orders import ORDER_LINE_DEFAULTS
+
+REGIONS = ["AT & DE", "GB & IE", "FR", "IT", "ES", "NL", "NORDICS", "CH", "PL", "JP", "HK", "IN", None]
+RESERVATIONS = ["Reserved for AOU (EU only)", "Reserved for AOU (GB & ROI only)", None]
+FAMILIES = {
+    "mac": ("RFB MACBOOK PRO", "RFB MBP", "Refurbished {size}-inch MacBook Pro"),
+    "iphone": ("IPHONE 13 D16 SEP21", "IPHONE 13", "Refurbished iPhone 13"),
+    "ipad": ("RFB IPAD PRO", "RFB IPAD PRO", "Refurbished {size}-inch iPad Pro"),
+    "watch": ("RFB WATCH S9", "RFB WATCH", "Refurbished Apple Watch Series 9"),
+    "airpods": ("AIRPODS PRO 2", "AIRPODS PRO", "AirPods Pro (2nd generation)"),
+    "appletv": ("APPLE TV 4K", "APPLE TV", "Apple TV 4K"),
+    "homepod": ("HOMEPOD MINI", "HOMEPOD", "HomePod mini"),
+    "accessories": ("ACCESSORIES", "CABLE", None),
+}
+SUBFAMILIES = ["AVAILABLE FOR REUSE", "J514", "J516", "J414", "D16", "N157", "B688"]
+COLORS = ["SL", "SB", "BLACK", "WHITE", "BLUE", "MIDNIGHT", "STARLIGHT"]
+COUNTRY_SUFFIXES = ["DEU", "GBR", "FRA", "ITA", "ESP", "NLD", "JPN", "HKG", "IND"]
+LOCATIONS = ["Cork", "Hyderabad", "Hong Kong", "Tokyo", "N/A"]
+
+def stock_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    families = rng.choice(list(FAMILIES), rows)
+    sizes = rng.choice([11, 13, 14, 16], rows)
+    colors = rng.choice(COLORS, rows)
+    suffixes = rng.choice(COUNTRY_SUFFIXES, rows)
+    storage = rng.choice(["64GB", "128GB", "256GB", "512GB", "1T"], rows)
+
+    # Unique 5-character part codes with a one-letter region suffix, like FRX73D/A
+    part_ids = rng.permutation(rows) + 36 ** 4
+    parts = [np.base_repr(int(part_id), 36) + "/A" for part_id in part_ids]
+    descriptions = [
+        f"RFB {family.upper()} {size} {color}/{store}-{suffix}"
+        for family, size, color, store, suffix in zip(families, sizes, colors, storage, suffixes)
+    ]
+    product_descriptions = [
+        None if FAMILIES[family][2] is None else FAMILIES[family][2].format(size=size)
+        for family, size in zip(families, sizes)
+    ]
+    return pd.DataFrame({
+        "Customer Country/Region": rng.choice(np.array(REGIONS, dtype=object), rows),
+        "": rng.choice(np.array(RESERVATIONS, dtype=object), rows),
+        "Part": parts,
+        "Description": descriptions,
+        "Product Description": product_descriptions,
+        "Product Family Code": families,
+        "Subclass Desc": [FAMILIES[family][0] for family in families],
+        "Subfamily Desc": [f"{FAMILIES[family][1]} {sub}" for family, sub in zip(families, rng.choice(SUBFAMILIES, rows))],
+        "ATC": rng.integers(0, 200, rows),
+    })
+
+def stock_csv_bytes(rows, seed=0):
+    return stock_frame(rows, seed).to_csv(index=False).encode()
+
+def order_items(catalog, lines, seed=0):
+    """Order line records drawn from a parsed catalog, with the app's default order fields."""
+    rng = np.random.default_rng(seed)
+    picked = catalog.iloc[rng.integers(0, len(catalog), lines)]
+    items = picked.assign(**ORDER_LINE_DEFAULTS).to_dict('records')
+    for item, quantity, price, location in zip(
+        items, rng.integers(1, 20, lines), rng.uniform(50, 2500, lines).round(2), rng.choice(LOCATIONS, lines)
+    ):
+        item.update({"Quantity": int(quantity), "Price per unit": float(price), "Location": str(location)})
+    return items
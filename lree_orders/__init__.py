@@ -0,0 +1,6 @@
+"""Headless core of the LREE Orders app.
+
+Catalog ingest, the order store and stock validation live here without any
+Streamlit dependency, so they can be imported by app.py, scripts and the
+batch CLI (``python -m lree_orders``) alike.
+"""
@@ -0,0 +1,115 @@
+"""Write-behind saving of current-order line edits.
+
+Edits are buffered per session and merged per line, and a single worker
+thread writes each buffer once it has been quiet for a short delay, so a
+burst of edits costs one transaction instead of one per change. Buffers
+are flushed on demand (before archiving or reloading) and at interpreter
+exit.
+"""
+import atexit
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from . import store
+
+AUTOSAVE_DELAY_SECONDS = 1.0  # Quiet period after the last edit before it is written
+AUTOSAVE_TICK_SECONDS = 0.25
+
+class OrderAutosave:
+    """One session's unsaved line edits: line_id -> {column: value}."""
+
+    def __init__(self):
+        self._pending = {}
+        self._changed_at = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Keeps flushes in order when the worker and session race
+        self._written = set()
+        self.saved_at = None
+        self.error = None
+        _worker.register(self)
+
+    @property
+    def dirty(self):
+        return bool(self._pending)
+
+    def update(self, changes):
+        with self._lock:
+            for line_id, values in changes.items():
+                self._pending.setdefault(line_id, {}).update(values)
+            self._changed_at = time.monotonic()
+
+    def discard(self, line_ids):
+        # Edits to lines that have since been removed are dropped rather than written
+        with self._lock:
+            for line_id in line_ids:
+                self._pending.pop(line_id, None)
+
+    def due(self, now):
+        return self._pending and now - self._changed_at >= AUTOSAVE_DELAY_SECONDS
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                changes, self._pending = self._pending, {}
+            if not changes:
+                return
+            try:
+                version = store.update_order_lines(changes)
+            except Exception as e:
+                # Keep the edits (under any newer ones) so the next flush retries them
+                with self._lock:
+                    for line_id, values in changes.items():
+                        self._pending[line_id] = {**values, **self._pending.get(line_id, {})}
+                self.error = str(e)
+                raise
+            if version is not None:
+                with self._lock:
+                    self._written.add(version)
+            self.saved_at = datetime.now()
+            self.error = None
+
+    def take_written_versions(self):
+        """Store change versions produced by this buffer's flushes since the last call."""
+        with self._lock:
+            written, self._written = self._written, set()
+        return written
+
+class _AutosaveWorker:
+    def __init__(self):
+        self._buffers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, buffer):
+        with self._lock:
+            self._buffers.add(buffer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="order-autosave", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(AUTOSAVE_TICK_SECONDS)
+            now = time.monotonic()
+            for buffer in self.buffers():
+                if buffer.due(now):
+                    try:
+                        buffer.flush()
+                    except Exception:
+                        pass  # Recorded on the buffer and retried on the next tick
+
+    def buffers(self):
+        with self._lock:
+            return list(self._buffers)
+
+    def flush_all(self):
+        for buffer in self.buffers():
+            try:
+                buffer.flush()
+            except Exception:
+                pass
+
+_worker = _AutosaveWorker()
+atexit.register(_worker.flush_all)
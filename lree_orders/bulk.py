@@ -0,0 +1,146 @@
+"""Matching a pasted list of Parts or descriptions, with quantities, against a catalog.
+
+Every entry is first looked up by Part in a case-folded hash of the catalog;
+entries that are not Parts are matched against the description columns
+through the prebuilt text search index, whose value matches are spread to
+rows with array lookups on the facet index codes.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from .catalog import TEXT_FILTER_COLUMNS
+
+BULK_MATCH_CANDIDATES = 5  # Catalog Parts offered for an entry that matches more than one
+BULK_MATCH_MIN_TERMS = 0.5  # Share of a description's words a partial match must contain
+BULK_MATCH_KINDS = ["Part", "Description", "Ambiguous", "Not found"]
+BULK_MATCH_SHORT_TERM = 2  # Words up to this long, like numbers, must match a whole word or its start
+
+_QUANTITY_FIELD = re.compile(r'^(?:x\s*|qty:?\s*)?(\d+)(?:\s*x)?$', re.IGNORECASE)
+_LEADING_QUANTITY = re.compile(r'^(\d+)\s*[x×]\s+(.+)$', re.IGNORECASE)
+_TRAILING_QUANTITY = re.compile(r'^(.+?)\s+(?:[x×]\s*(\d+)|(\d+)\s*[x×]|qty:?\s*(\d+))$', re.IGNORECASE)
+_TRAILING_NUMBER = re.compile(r'^(\S*(?:\d\S*[^\W\d_]|[^\W\d_]\S*\d|/)\S*)\s+(\d+)$')
+
+def _parse_entry(line):
+    # (query, quantity) for one pasted line; spreadsheet cells arrive tab-separated
+    fields = [field.strip() for field in re.split(r'[\t,;]', line) if field.strip()]
+    if len(fields) > 1:
+        quantity = _QUANTITY_FIELD.match(fields[-1])
+        if quantity:
+            return " ".join(fields[:-1]), int(quantity.group(1))
+        quantity = _QUANTITY_FIELD.match(fields[0])
+        if quantity:
+            return " ".join(fields[1:]), int(quantity.group(1))
+        return " ".join(fields), 1
+    text = " ".join(fields)
+    if match := _LEADING_QUANTITY.match(text):
+        return match.group(2), int(match.group(1))
+    if match := _TRAILING_QUANTITY.match(text):
+        return match.group(1), int(next(group for group in match.groups()[1:] if group))
+    # A bare trailing number only counts after a single Part-like token (letters and digits,
+    # or a slash) as in "MK1E3B/A 3"; otherwise it is more likely part of a name ("iPhone 15")
+    if match := _TRAILING_NUMBER.match(text):
+        return match.group(1), int(match.group(2))
+    return text, 1
+
+def parse_bulk_entries(text):
+    """One row per non-empty pasted line with Entry (line number), Text, Query and Quantity.
+
+    A quantity is taken from a separate cell or field ("MK1E3B/A, 3"), an "x"
+    marker ("3 x MacBook Air", "MacBook Air x3") or a number after a single
+    Part-like token ("MK1E3B/A 3"); otherwise it is 1.
+    """
+    rows = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if line.strip():
+            query, quantity = _parse_entry(line)
+            rows.append({"Entry": number, "Text": line.strip(), "Query": query, "Quantity": quantity})
+    return pd.DataFrame(rows, columns=["Entry", "Text", "Query", "Quantity"])
+
+def part_rows(df):
+    """Case-folded Part -> catalog row position; the last row wins for duplicated parts, as in part_atc."""
+    keys = pd.Index(df['Part'].astype(str).str.strip().str.casefold())
+    positions = pd.Series(np.arange(len(df)), index=keys)
+    return positions[~keys.duplicated(keep='last')]
+
+def _starts_token(term, tokens):
+    # Whether a word token is `term` or begins with it; a number must not run on into more digits
+    # (so "2" finds "2nd" but not "256gb")
+    return any(token.startswith(term) and not (term.isdigit() and token[len(term):][:1].isdigit())
+               for token in tokens)
+
+def _description_scores(facet_index, query):
+    """Per-row relevance of `query` over the description columns, 0 where a row does not match.
+
+    Each word may be found in any of the columns. Rows with every word rank
+    first; failing any, rows with at least BULK_MATCH_MIN_TERMS of the words
+    are ranked by how many they have. Short words and numbers only count at
+    the start of a word, so "mini 2" does not match every "256GB".
+    """
+    search = facet_index.search
+    columns = [col for col in TEXT_FILTER_COLUMNS if col != 'Part' and col in facet_index.values]
+    terms = search.parse_query(query)
+    hits = np.zeros(facet_index.num_rows, dtype=np.int32)
+    totals = np.zeros(facet_index.num_rows)
+    for term in terms:
+        term_scores = np.zeros(facet_index.num_rows)
+        whole_words = len(term) <= BULK_MATCH_SHORT_TERM or term.isdigit()
+        for column in columns:
+            # Value relevance spread to rows through the value codes; code -1 (missing) is the appended 0
+            value_scores = np.zeros(len(facet_index.values[column]) + 1)
+            tokens = search.tokens[column]
+            for value_id, score in search.match(column, term).items():
+                if not whole_words or _starts_token(term, tokens[value_id]):
+                    value_scores[value_id] = score
+            np.maximum(term_scores, value_scores[facet_index.codes[column]], out=term_scores)
+        hits += term_scores > 0
+        totals += term_scores
+    if not terms or (hits.size and hits.max() == len(terms)):
+        needed = len(terms)
+    else:
+        needed = max(1, int(np.ceil(len(terms) * BULK_MATCH_MIN_TERMS)))
+    return np.where(hits >= max(needed, 1), hits * 10 + totals, 0)
+
+def match_bulk_entries(entries, df, part_index, facet_index):
+    """Match parsed entries to catalog rows.
+
+    Adds Match (one of BULK_MATCH_KINDS) and Candidates: catalog row positions of
+    distinct Parts, best first, with exactly one for a Part or unambiguous
+    Description match. Identical queries are matched once.
+    """
+    entries = entries.copy()
+    keys = entries['Query'].str.strip().str.casefold()
+    exact = keys.map(part_index)  # One vectorized hash lookup for every entry
+    candidates = {}
+    parts = df['Part'].to_numpy()
+    for query in entries.loc[exact.isna(), 'Query'].unique():
+        scores = _description_scores(facet_index, query)
+        rows = np.flatnonzero(scores)
+        ranked = rows[np.argsort(-scores[rows], kind='stable')]
+        # Keep the best row per Part, so candidates are distinct Parts
+        distinct = ~pd.Series(parts[ranked]).duplicated().to_numpy()
+        candidates[query] = ranked[distinct][:BULK_MATCH_CANDIDATES].tolist()
+
+    entries['Candidates'] = [
+        [int(row)] if pd.notna(row) else candidates[query] for row, query in zip(exact, entries['Query'])
+    ]
+    counts = entries['Candidates'].str.len()
+    entries['Match'] = np.select(
+        [exact.notna(), counts == 1, counts > 1], BULK_MATCH_KINDS[:3], default=BULK_MATCH_KINDS[3]
+    )
+    return entries
+
+def bulk_order_rows(df, entries, choices):
+    """Catalog rows to add for matched entries, with each entry's Quantity.
+
+    `choices` maps Entry -> chosen catalog row position (or None to skip) for
+    ambiguous entries; other entries use their only candidate.
+    """
+    positions, quantities = [], []
+    for entry, kind, found, quantity in entries[['Entry', 'Match', 'Candidates', 'Quantity']].itertuples(index=False):
+        row = choices.get(entry) if kind == "Ambiguous" else (found[0] if found else None)
+        if row is not None:
+            positions.append(row)
+            quantities.append(quantity)
+    return df.iloc[positions].assign(Quantity=quantities).reset_index(drop=True)
@@ -0,0 +1,294 @@
+"""Stock catalog ingest and the indexes behind the Filtered View."""
+import hashlib
+import io
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+FACET_MEMO_BYTES = 32 * 1024 * 1024  # Memory for filter selection prefixes remembered per catalog
+FILTER_ORDER = [
+    "Product Family Code",
+    "Product Description",
+    "Description",
+    "Subclass Desc",
+    "Subfamily Desc",
+    "Country/Region",
+    "Part"
+]
+TEXT_FILTER_COLUMNS = ["Product Description", "Description", "Part"]
+SEARCH_GRAM_SIZE = 3  # Longest n-gram kept in the text search index
+CATEGORICAL_MAX_RATIO = 0.5  # Text columns with at most this many distinct values per row become categoricals
+
+# --- Catalog Ingest ---
+def file_hash(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def parse_catalog(file_bytes):
+    df = pd.read_csv(io.BytesIO(file_bytes))
+    if any(col.startswith('Unnamed:') for col in df.columns):
+        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    df.columns = df.columns.str.strip()
+
+    # Normalize dtypes once here instead of on every use
+    if 'ATC' in df.columns:
+        df['ATC'] = pd.to_numeric(df['ATC'], errors='coerce').fillna(0).astype(int)
+    if 'Part' in df.columns:
+        df['Part'] = df['Part'].astype(str).str.strip()
+    return compact_catalog(df.reset_index(drop=True))
+
+def compact_catalog(df):
+    # Family, subclass and region values repeat on most rows; store each distinct string once.
+    # Part stays plain text since it is the join key for orders and stock history.
+    for col in df.columns:
+        if col == 'Part' or not (df[col].dtype == object or pd.api.types.is_string_dtype(df[col])):
+            continue
+        if df[col].nunique() <= CATEGORICAL_MAX_RATIO * len(df):
+            df[col] = df[col].astype('category')
+    return df
+
+def read_catalog(path):
+    with open(path, 'rb') as f:
+        return parse_catalog(f.read())
+
+def part_atc(df):
+    # Part -> ATC lookup for one catalog; the last row wins for duplicated parts
+    return df.drop_duplicates('Part', keep='last').set_index('Part')['ATC']
+
+def sort_order(df, column, descending=False):
+    # Row positions of the catalog sorted by one column, missing values last
+    return df[column].sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+
+# --- Faceted Filter Index ---
+class _Memo:
+    """Thread-safe LRU memo of computed results, bounded by the FACET_MEMO_BYTES they hold."""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> (result, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(result):
+        # Bytes held by the result itself; option values and value ids are shared with the index
+        return result.nbytes if isinstance(result, np.ndarray) else sys.getsizeof(result)
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        result = compute()
+        size = self._size(result)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._bytes > FACET_MEMO_BYTES and len(self._entries) > 1:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+class FacetIndex:
+    """Per-column value -> sorted row position arrays for one catalog.
+
+    The filter cascade is expressed as a tuple of steps; the rows matching
+    every prefix of that tuple are memoized, so changing the last filter
+    never recomputes the earlier ones.
+    """
+
+    def __init__(self, num_rows, codes, values, order, bounds, load_search=None):
+        # Per column: row -> value id, value id -> value, and row positions grouped by value id,
+        # where value id j's rows are order[bounds[j]:bounds[j + 1]]. Arrays may be memory-mapped.
+        self.num_rows = num_rows
+        self.codes = codes
+        self.values = values
+        self.order = order
+        self.bounds = bounds
+        self._load_search = load_search
+        self._search = None
+        self._memo = _Memo()
+        self._search_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, df, columns):
+        codes, values, order, bounds = {}, {}, {}, {}
+        for column in columns:
+            column_codes, uniques = pd.factorize(df[column])  # NaN gets code -1 and no posting
+            values[column] = pd.Index(np.asarray(uniques, dtype=object))  # Categoricals factorize to a Categorical
+            codes[column] = column_codes
+            order[column] = np.argsort(column_codes, kind='stable')
+            bounds[column] = np.searchsorted(column_codes[order[column]], np.arange(len(uniques) + 1))
+        return cls(len(df), codes, values, order, bounds)
+
+    @property
+    def search(self):
+        # Built or loaded on the first text search, so the cascade is usable before it exists
+        if self._search is None:
+            with self._search_lock:
+                if self._search is None:
+                    self._search = self._load_search()
+        return self._search
+
+    def posting(self, column, value_id):
+        bounds = self.bounds[column]
+        return self.order[column][bounds[value_id]:bounds[value_id + 1]]
+
+    def _remember(self, key, compute):
+        return self._memo.get(key, compute)
+
+    def value_ids(self, column, values):
+        lookup = self.values[column]
+        ids = lookup.get_indexer(list(values))
+        return ids[ids >= 0]
+
+    def _step_rows(self, step):
+        column, kind, payload = step
+        if kind == "search":
+            ids = np.fromiter(self.search.match(column, payload), dtype=np.intp)
+        else:
+            ids = self.value_ids(column, payload)
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate([self.posting(column, j) for j in ids]))
+
+    def rows(self, steps):
+        # None means "every row" so an unfiltered catalog is never materialized
+        steps = tuple(steps)
+        if not steps:
+            return None
+
+        def compute():
+            previous = self.rows(steps[:-1])
+            current = self._step_rows(steps[-1])
+            if previous is None:
+                return current
+            return np.intersect1d(previous, current, assume_unique=True)
+        return self._remember(("rows", steps), compute)
+
+    def options(self, column, steps):
+        # Values of `column` still present after applying `steps`, in catalog order
+        steps = tuple(steps)
+
+        def compute():
+            rows = self.rows(steps)
+            if rows is None:
+                return list(self.values[column])
+            codes = np.unique(self.codes[column][rows])
+            return list(self.values[column].take(codes[codes >= 0]))
+        return self._remember(("options", column, steps), compute)
+
+    def rank(self, steps):
+        # Rows matching `steps` ordered by the summed relevance of every text search step, best first
+        steps = tuple(steps)
+        rows = self.rows(steps)
+        if rows is None or not any(kind == "search" for _, kind, _ in steps):
+            return rows
+
+        def compute():
+            scores = np.zeros(len(rows))
+            for column, kind, payload in steps:
+                if kind == "search":
+                    # Value relevance spread to rows through the value codes; code -1 (missing) is the appended 0
+                    matches = self.search.match(column, payload)
+                    value_scores = np.zeros(len(self.values[column]) + 1)
+                    value_scores[np.fromiter(matches, dtype=np.intp, count=len(matches))] = list(matches.values())
+                    scores += value_scores[self.codes[column][rows]]
+            return rows[np.argsort(-scores, kind='stable')]
+        return self._remember(("rank", steps), compute)
+
+# --- Text Search Index ---
+def _grams(text):
+    # Every distinct 1..SEARCH_GRAM_SIZE character substring of `text`
+    return {text[i:i + n] for n in range(1, SEARCH_GRAM_SIZE + 1) for i in range(len(text) - n + 1)}
+
+class SearchIndex:
+    """Case-folded token and n-gram index over the distinct values of text columns.
+
+    Matching works on value ids of the facet index (descriptions repeat across
+    rows), so the row postings there turn a match straight into a row set.
+    Queries are literal: whitespace separates tokens that must all appear,
+    and a quoted query is matched as a single phrase.
+    """
+
+    def __init__(self, folded, tokens, grams):
+        # Per column: case-folded value texts, their word tokens, and n-gram -> value ids
+        self.folded = folded
+        self.tokens = tokens
+        self.grams = grams
+        self._memo = _Memo()
+
+    @classmethod
+    def build(cls, facet_index, columns):
+        folded, tokens, grams = {}, {}, {}
+        for column in columns:
+            texts = [str(value).casefold() for value in facet_index.values[column]]
+            column_grams = {}
+            for value_id, text in enumerate(texts):
+                for gram in _grams(text):
+                    column_grams.setdefault(gram, []).append(value_id)
+            folded[column] = texts
+            tokens[column] = [set(re.findall(r'\w+', text)) for text in texts]
+            grams[column] = {gram: set(ids) for gram, ids in column_grams.items()}
+        return cls(folded, tokens, grams)
+
+    @staticmethod
+    def parse_query(query):
+        query = query.strip().casefold()
+        if len(query) > 1 and query[0] == query[-1] == '"':
+            return [query[1:-1]] if query[1:-1] else []
+        return query.split()
+
+    def _candidates(self, column, term):
+        grams = self.grams[column]
+        if len(term) <= SEARCH_GRAM_SIZE:
+            return grams.get(term, set())
+        # Every n-gram of the term must occur, then verify the literal substring
+        pieces = [term[i:i + SEARCH_GRAM_SIZE] for i in range(len(term) - SEARCH_GRAM_SIZE + 1)]
+        postings = sorted((grams.get(piece, set()) for piece in pieces), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        folded = self.folded[column]
+        return {value_id for value_id in candidates if term in folded[value_id]}
+
+    def _score(self, column, value_id, terms, query):
+        tokens = self.tokens[column][value_id]
+        score = 0
+        for term in terms:
+            if term in tokens:
+                score += 3
+            elif any(token.startswith(term) for token in tokens):
+                score += 2
+            else:
+                score += 1
+        if len(terms) > 1 and query in self.folded[column][value_id]:
+            score += 2  # Whole query appears as typed
+        return score
+
+    def match(self, column, query):
+        """Return {value_id: relevance} for values containing every query term."""
+        def compute():
+            terms = self.parse_query(query)
+            matches = None
+            for term in sorted(terms, key=len, reverse=True):
+                found = self._candidates(column, term)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    break
+            folded_query = query.strip().casefold()
+            return {value_id: self._score(column, value_id, terms, folded_query) for value_id in (matches or ())}
+        return self._memo.get((column, query), compute)
+
+def build_facet_index(df):
+    facet_index = FacetIndex.build(df, [col for col in FILTER_ORDER if col in df.columns])
+    facet_index._load_search = lambda: SearchIndex.build(
+        facet_index, [col for col in TEXT_FILTER_COLUMNS if col in facet_index.values]
+    )
+    return facet_index
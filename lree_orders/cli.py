@@ -0,0 +1,156 @@
+"""Command-line entry point: ``python -m lree_orders <command> ...``.
+
+Heavy imports (pandas, the store) happen inside each command so that
+``--help`` and argument errors return immediately.
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+def _batch(args):
+    from . import store
+    from .catalog import read_catalog
+
+    catalog = read_catalog(args.stock_file)
+    store.ORDERS_DB_FILE = args.db
+    store.init_orders_db()
+    reserved = store.load_reservations()
+    known_parts = set(catalog['Part'])
+
+    order_files = sorted(Path(args.orders_dir).glob("*.csv"))
+    out = open(args.summary, 'w') if args.summary != '-' else sys.stdout
+    archived_count = invalid_count = failed_count = 0
+    try:
+        for path in order_files:
+            try:
+                result = _batch_order(args, path, catalog, known_parts, reserved)
+            except Exception as e:
+                # One unreadable or malformed order is reported and skipped, not fatal to the batch
+                failed_count += 1
+                result = {"order": path.stem, "file": str(path), "error": f"{type(e).__name__}: {e}", "archived": False}
+            else:
+                invalid_count += bool(result["stock_errors"])
+                archived_count += result["archived"]
+            out.write(json.dumps(result, default=str) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"Processed {len(order_files)} order(s): {failed_count} failed, {invalid_count} with stock errors, "
+        f"{archived_count} archived.",
+        file=sys.stderr
+    )
+    if failed_count:
+        return 2
+    return 1 if invalid_count and not args.allow_stock_errors else 0
+
+def _batch_order(args, path, catalog, known_parts, reserved):
+    import pandas as pd
+
+    from . import store
+    from .orders import new_order_lines, read_order_file, summarize_order
+    from .validation import reserved_quantities, validate_stock
+
+    lines = read_order_file(path, catalog)
+    items = new_order_lines(lines)
+    stock = validate_stock(pd.DataFrame(items), reserved)
+    exceeding = stock[stock['Exceeds']]
+    summary = summarize_order(items)
+    result = {
+        "order": path.stem,
+        "file": str(path),
+        "lines": summary['item_count'],
+        "total": summary['total'],
+        "location_totals": summary['location_totals'],
+        "unknown_parts": sorted(set(lines['Part']) - known_parts),
+        "stock_errors": exceeding[['Part', 'Requested', 'Available']].to_dict('records'),
+        "archived": False,
+        "order_id": None,
+    }
+    if args.archive and (not result["stock_errors"] or args.allow_stock_errors):
+        entry = store.archive_order(path.stem, items)
+        result.update(archived=True, order_id=entry['order_id'])
+        # Later orders in the same batch see this order's reservations
+        for part, quantity in reserved_quantities(items).items():
+            reserved.loc[part] = reserved.get(part, 0) + quantity
+    return result
+
+def _trace(args):
+    from .trace import read_trace, summarize_trace
+
+    spans = read_trace(args.trace_file)
+    if args.stage:
+        spans = spans[spans['stage'].isin(args.stage)]
+    print(summarize_trace(spans).to_string(index=False, float_format=lambda s: f"{s * 1000:.1f}ms"))
+    return 0
+
+def _export(args):
+    from . import store
+    from .export import export_chunks, export_format_error, write_export
+
+    fmt = args.format or Path(args.out).suffix.lstrip('.').lower()
+    error = export_format_error(fmt)
+    if error:
+        args.parser.error(error)  # Before the output file is created
+    store.ORDERS_DB_FILE = args.db
+    store.init_orders_db()
+    chunks = export_chunks(args.scope, args.date_from, args.date_to, args.location, args.status)
+    with open(args.out, 'wb') as out:
+        count = write_export(chunks, fmt, out)
+    print(f"Exported {count} line(s) to {args.out}.", file=sys.stderr)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="lree_orders", description="Headless LREE order processing.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser(
+        "batch", help="Validate and price a directory of order CSVs against a stock file.",
+        description="Each *.csv in ORDERS_DIR is one order (name = file name) with at least a Part column; "
+                    "Quantity, Price per unit, Location, Hardware DRI and 1-line Justification are optional. "
+                    "One JSON summary per order is written as a line to --summary; an order that cannot be "
+                    "processed gets an 'error' line and the batch carries on. Exits 2 if any order failed, "
+                    "1 if any exceeded stock (unless --allow-stock-errors), else 0."
+    )
+    batch.add_argument("stock_file", help="Stock CSV, e.g. '30-07-2025 Refurb Stock File.csv'")
+    batch.add_argument("orders_dir", help="Directory of order CSV files")
+    batch.add_argument("--archive", action="store_true", help="Archive orders that pass the stock check")
+    batch.add_argument("--allow-stock-errors", action="store_true",
+                       help="Archive orders even if they exceed stock, and exit 0")
+    batch.add_argument("--db", default="orders.db", help="Order database (default: orders.db)")
+    batch.add_argument("--summary", default="-", help="JSON-lines summary output (default: stdout)")
+    batch.set_defaults(handler=_batch)
+
+    trace = commands.add_parser(
+        "trace", help="Summarize an app trace file (LREE_TRACE_FILE) as p50/p95 per stage."
+    )
+    trace.add_argument("trace_file", help="JSON-lines trace written by the app")
+    trace.add_argument("--stage", action="append", help="Only these stages (repeatable)")
+    trace.set_defaults(handler=_trace)
+
+    export = commands.add_parser(
+        "export", help="Export filtered order lines to CSV, XLSX or Parquet.",
+        description="Streams current and/or archived order lines matching the filters to OUT. "
+                    "The format is taken from OUT's extension unless --format is given."
+    )
+    export.add_argument("out", help="Output file, e.g. lines.csv, lines.xlsx or lines.parquet")
+    export.add_argument("--format", choices=["csv", "xlsx", "parquet"])
+    export.add_argument("--scope", choices=["all", "past", "current"], default="all",
+                        help="Which orders to export (default: all)")
+    export.add_argument("--from", dest="date_from", type=date.fromisoformat,
+                        help="Archived on or after this date (YYYY-MM-DD)")
+    export.add_argument("--to", dest="date_to", type=date.fromisoformat,
+                        help="Archived on or before this date (YYYY-MM-DD)")
+    export.add_argument("--location", action="append", help="Only lines at this location (repeatable)")
+    export.add_argument("--status", action="append", choices=["Open", "Approved", "Delivered", "Transferred"],
+                        help="Only lines with this status (repeatable)")
+    export.add_argument("--db", default="orders.db", help="Order database (default: orders.db)")
+    export.set_defaults(handler=_export, parser=export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
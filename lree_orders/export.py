@@ -0,0 +1,146 @@
+"""Filtered extracts of current and archived order lines as CSV, XLSX or Parquet.
+
+Lines are read and written in chunks of orders, so memory stays bounded by
+EXPORT_CHUNK_ORDERS orders whatever the size of the archive. XLSX needs the
+optional openpyxl package; Parquet uses pyarrow.
+"""
+import importlib.util
+import io
+import json
+
+import pandas as pd
+
+from . import store
+from .orders import ORDER_LINE_COLUMNS, line_status
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_FORMAT_PACKAGES = {"xlsx": "openpyxl"}  # Optional packages a format needs
+EXPORT_SCOPES = ["all", "past", "current"]
+EXPORT_CHUNK_ORDERS = 200  # Archived orders read per chunk
+CURRENT_ORDER_NAME = "(current order)"
+
+# Export column -> dtype; every chunk is cast to these so chunks share one schema
+EXPORT_COLUMNS = {
+    "Order": "string",
+    "Archived": "string",
+    "Line": "Int64",
+    **{col: {"TEXT": "string", "INTEGER": "Int64", "REAL": "Float64", "BOOLEAN": "boolean"}[sql_type]
+       for col, sql_type in ORDER_LINE_COLUMNS.items()},
+    "Status": "string",
+    "Total Unit Cost": "Float64",
+}
+
+def export_format_error(fmt):
+    """Why `fmt` cannot be exported here, or None if it can."""
+    if fmt not in EXPORT_FORMATS:
+        return f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}"
+    package = EXPORT_FORMAT_PACKAGES.get(fmt)
+    if package and importlib.util.find_spec(package) is None:
+        return f"{fmt.upper()} export needs the {package} package: pip install {package}"
+    return None
+
+def available_export_formats():
+    return [fmt for fmt in EXPORT_FORMATS if export_format_error(fmt) is None]
+
+def _export_frame(order_name, archived_at, items, locations=None, statuses=None):
+    lines = pd.DataFrame.from_records(items).reindex(columns=list(ORDER_LINE_COLUMNS))
+    lines.insert(0, "Line", range(1, len(lines) + 1))
+    lines.insert(0, "Archived", archived_at or None)
+    lines.insert(0, "Order", order_name)
+    lines["Status"] = [line_status(item) for item in items]
+    for col in ["Approved", "Delivered", "Transferred"]:
+        lines[col] = lines[col].fillna(False)
+    if locations:
+        lines = lines[lines["Location"].isin(locations)]
+    if statuses:
+        lines = lines[lines["Status"].isin(statuses)]
+    lines["Total Unit Cost"] = lines["Quantity"].fillna(0) * lines["Price per unit"].fillna(0)
+    return lines.astype(EXPORT_COLUMNS)
+
+def _matching_order_ids(conn, date_from, date_to, locations, statuses):
+    clauses, params = [], []
+    if date_from:
+        clauses.append("o.archived_at >= ?")
+        params.append(date_from.isoformat())
+    if date_to:
+        clauses.append("o.archived_at < date(?, '+1 day')")
+        params.append(date_to.isoformat())
+    # Only orders with at least one matching line are read, found through the line index
+    for column, values in (("location", locations), ("status", statuses)):
+        if values:
+            clauses.append(f"i.{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return [row[0] for row in conn.execute(
+        f"SELECT DISTINCT o.order_id FROM past_orders o JOIN past_order_line_index i ON i.order_id = o.order_id"
+        f"{where} ORDER BY o.order_id", params
+    )]
+
+def export_chunks(scope="all", date_from=None, date_to=None, locations=None, statuses=None):
+    """Yield DataFrames of matching order lines with EXPORT_COLUMNS, one chunk of orders at a time.
+
+    `scope` is 'past', 'current' or 'all'. The date range applies to archived orders only;
+    location and status (the furthest of Approved/Delivered/Transferred) filter lines.
+    """
+    if scope in ("past", "all"):
+        conn = store.connect_orders_db()
+        try:
+            order_ids = _matching_order_ids(conn, date_from, date_to, locations, statuses)
+            for start in range(0, len(order_ids), EXPORT_CHUNK_ORDERS):
+                chunk_ids = order_ids[start:start + EXPORT_CHUNK_ORDERS]
+                rows = conn.execute(
+                    "SELECT o.name, o.archived_at, l.lines FROM past_orders o JOIN past_order_lines l "
+                    f"ON l.order_id = o.order_id WHERE o.order_id IN ({', '.join('?' for _ in chunk_ids)}) "
+                    "ORDER BY o.order_id", chunk_ids
+                ).fetchall()
+                frames = [_export_frame(name, archived_at, json.loads(lines), locations, statuses)
+                          for name, archived_at, lines in rows]
+                yield pd.concat(frames, ignore_index=True)
+        finally:
+            conn.close()
+    if scope in ("current", "all"):
+        items = store.load_current_order().reset_index(drop=True).to_dict('records')
+        if items:
+            lines = _export_frame(CURRENT_ORDER_NAME, None, items, locations, statuses)
+            if not lines.empty:
+                yield lines
+
+def write_export(chunks, fmt, out):
+    """Write export chunks to a binary file object; returns the number of lines written.
+
+    Check the format with export_format_error() first to fail before creating the output.
+    """
+    error = export_format_error(fmt)
+    if error:
+        raise ValueError(error)
+    count = 0
+    if fmt == "csv":
+        text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+        pd.DataFrame(columns=list(EXPORT_COLUMNS)).to_csv(text, index=False)
+        for chunk in chunks:
+            chunk.to_csv(text, index=False, header=False)
+            count += len(chunk)
+        text.detach()  # Leave `out` open for the caller
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.Schema.from_pandas(pd.DataFrame(columns=list(EXPORT_COLUMNS)).astype(EXPORT_COLUMNS), preserve_index=False)
+        with pq.ParquetWriter(out, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                count += len(chunk)
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)  # Rows are streamed to the file rather than kept as cells
+        sheet = workbook.create_sheet("Order lines")
+        sheet.append(list(EXPORT_COLUMNS))
+        for chunk in chunks:
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+                sheet.append(list(row))
+            count += len(chunk)
+        workbook.save(out)
+    return count
@@ -0,0 +1,69 @@
+"""Background watcher that loads stock files dropped into a folder."""
+import os
+import threading
+import time
+from datetime import datetime
+
+from .catalog import file_hash, parse_catalog
+
+class FeedCatalog:
+    def __init__(self, file_hash, file_name, df):
+        self.file_hash = file_hash
+        self.file_name = file_name
+        self.df = df
+        self.loaded_at = datetime.now()
+
+class StockFeed:
+    """Background worker that watches a drop folder for stock files.
+
+    The newest CSV is parsed on the worker thread and published by replacing
+    `latest` in one assignment, so sessions only ever see a complete catalog.
+    A file is only read once its size and modification time are unchanged
+    across two polls, so one still being copied in is not published half
+    written. Hidden and temporary names (".x.csv", "~$x.csv") are ignored,
+    so writers may also copy to such a name and rename into place.
+    """
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.latest = None
+        self.error = None
+        self.checked_at = None
+        self._signature = None
+        self._unsettled = None  # Signature seen on the last poll but not yet loaded
+        threading.Thread(target=self._run, name="stock-feed", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+            self.checked_at = datetime.now()
+            time.sleep(self.interval)
+
+    def poll(self):
+        if not os.path.isdir(self.directory):
+            return
+        files = [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.lower().endswith('.csv') and not entry.name.startswith(('.', '~'))
+        ]
+        if not files:
+            return
+        newest = max(files, key=lambda entry: entry.stat().st_mtime)
+        signature = (newest.name, newest.stat().st_mtime, newest.stat().st_size)
+        if signature == self._signature:
+            return
+        if signature != self._unsettled:
+            # Still changing, or seen for the first time: wait for the next poll to confirm it
+            self._unsettled = signature
+            return
+        with open(newest.path, 'rb') as f:
+            file_bytes = f.read()
+        content_hash = file_hash(file_bytes)
+        if self.latest is None or self.latest.file_hash != content_hash:
+            self.latest = FeedCatalog(content_hash, newest.name, parse_catalog(file_bytes))
+        self._signature = signature
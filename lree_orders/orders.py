@@ -0,0 +1,182 @@
+"""Order line schema, defaults and the in-memory order model."""
+import numpy as np
+import pandas as pd
+
+# Typed columns of an order line; any other catalog columns ride along in `extra` as JSON
+ORDER_LINE_COLUMNS = {
+    "Part": "TEXT",
+    "Description": "TEXT",
+    "ATC": "INTEGER",
+    "Quantity": "INTEGER",
+    "Price per unit": "REAL",
+    "Hardware DRI": "TEXT",
+    "Location": "TEXT",
+    "1-line Justification": "TEXT",
+    "Approved": "BOOLEAN",
+    "Delivered": "BOOLEAN",
+    "Transferred": "BOOLEAN",
+}
+ORDER_LINE_DEFAULTS = {
+    "Quantity": 1,
+    "Price per unit": 0.0,
+    "Hardware DRI": "",
+    "Location": "Cork",
+    "1-line Justification": "",
+    "Approved": False,
+    "Delivered": False,
+    "Transferred": False,
+}
+ORDER_STATUSES = ["Open", "Approved", "Delivered", "Transferred"]
+# Display-only columns that are never stored
+ORDER_TRANSIENT_COLUMNS = ["line_id", "Remove", "Status", "Total Unit Cost"]
+# Per-unit asset fields of an archived line (display name -> past_order_assets column)
+ASSET_COLUMNS = {"S/N": "serial", "Received": "received", "Current Owner": "current_owner"}
+# A line expands into one asset row per unit ordered
+ASSET_UNIT_COLUMN = "Quantity"
+# Spend is aggregated over all lines and per value of each of these (dimension -> line field)
+SPEND_DIMENSIONS = {"location": "Location", "status": "Status", "family": "Product Family Code"}
+
+def plain_value(value):
+    # numpy scalars -> Python scalars and NaN -> None, for SQLite and JSON
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+# --- Current Order Model ---
+# The current order is one DataFrame indexed by line_id.
+# Edits are applied to it (and the store) as deltas rather than rebuilt from records.
+def order_frame(items):
+    frame = pd.DataFrame.from_records(items, columns=None) if items else pd.DataFrame(columns=['line_id'])
+    frame = frame.set_index('line_id')
+    for col in ORDER_LINE_COLUMNS:
+        if col not in frame.columns:
+            frame[col] = ORDER_LINE_DEFAULTS.get(col)
+    # Stored NULLs, such as fields left blank in an added row, take their defaults too
+    frame = frame.fillna(ORDER_LINE_DEFAULTS).infer_objects()
+    frame['Remove'] = False
+    return frame
+
+def order_records(frame):
+    # Plain records for archiving: stored columns only, missing values as None
+    stored = frame.drop(columns=[col for col in ORDER_TRANSIENT_COLUMNS if col in frame.columns])
+    return stored.astype(object).where(stored.notna(), None).to_dict('records')
+
+def new_order_lines(rows):
+    """Order line records for catalog rows, filling in default order fields they lack or leave blank."""
+    defaults = {col: value for col, value in ORDER_LINE_DEFAULTS.items() if col not in rows.columns}
+    return rows.assign(**defaults).fillna(ORDER_LINE_DEFAULTS).infer_objects().to_dict('records')
+
+def order_part_lines(frame):
+    """Part -> line_id of the first line for each Part, the line that later additions merge into."""
+    parts = frame['Part']
+    first = parts.notna() & ~parts.duplicated()
+    return dict(zip(parts[first], frame.index[first]))
+
+def merge_added_lines(rows, part_lines, merge=True):
+    """Split rows being added to an order into quantity increases for existing lines and new lines.
+
+    With `merge`, a Part already in `part_lines` adds its quantity to that line, and
+    repeated Parts among `rows` become a single line. Returns ({line_id: added quantity},
+    new line records).
+    """
+    rows = rows.assign(Quantity=rows['Quantity'].fillna(ORDER_LINE_DEFAULTS['Quantity'])
+                       if 'Quantity' in rows.columns else ORDER_LINE_DEFAULTS['Quantity'])
+    if not merge:
+        return {}, new_order_lines(rows)
+    has_part = rows['Part'].notna() & (rows['Part'] != '')
+    keyed = rows[has_part]
+    quantities = keyed.groupby('Part', sort=False)['Quantity'].sum()
+    keyed = keyed.drop_duplicates('Part').assign(Quantity=quantities.to_numpy())
+    existing = keyed['Part'].map(part_lines)
+    merged = existing.notna()
+    increments = {int(line_id): quantity for line_id, quantity in zip(existing[merged], keyed.loc[merged, 'Quantity'])}
+    return increments, new_order_lines(pd.concat([keyed[~merged], rows[~has_part]]))
+
+def read_order_file(path, catalog):
+    """Order lines from a CSV with at least a Part column, completed from the catalog."""
+    order = pd.read_csv(path)
+    order.columns = order.columns.str.strip()
+    order['Part'] = order['Part'].astype(str).str.strip()
+    order = order.drop(columns=['ATC'], errors='ignore')  # Stock always comes from the catalog
+    catalog_rows = catalog.drop_duplicates('Part', keep='last')
+    # Columns given in the order file win over catalog values
+    catalog_rows = catalog_rows[['Part', *[col for col in catalog_rows.columns if col not in order.columns]]]
+    lines = order.merge(catalog_rows, on='Part', how='left')
+    if 'ATC' in lines.columns:
+        lines['ATC'] = lines['ATC'].fillna(0).astype(int)
+    else:
+        lines['ATC'] = 0
+    return lines
+
+def line_cost(item):
+    return float(plain_value(item.get('Quantity')) or 0) * float(plain_value(item.get('Price per unit')) or 0)
+
+def line_status(item):
+    # The furthest of Approved/Delivered/Transferred a line has reached
+    status = "Open"
+    for candidate in ORDER_STATUSES[1:]:
+        if item.get(candidate):
+            status = candidate
+    return status
+
+def spend_keys(item):
+    """The aggregate buckets a line's spend counts towards, as (dimension, key) pairs."""
+    keys = [("total", "All")]
+    for dimension, field in SPEND_DIMENSIONS.items():
+        value = line_status(item) if field == "Status" else plain_value(item.get(field))
+        keys.append((dimension, str(value) if value not in (None, "") else "N/A"))
+    return keys
+
+def spend_buckets(items, sign=1):
+    """{(dimension, key): (total, lines)} over the buckets these lines' spend counts towards."""
+    buckets = {}
+    for item in items:
+        cost = line_cost(item)
+        for bucket in spend_keys(item):
+            total, lines = buckets.get(bucket, (0.0, 0))
+            buckets[bucket] = (total + sign * cost, lines + sign)
+    return buckets
+
+def order_spend(frame):
+    """Spend of an in-memory order in the shape of store.load_spend_totals(), without the scope.
+
+    Vectorized over the order's lines; buckets match spend_keys().
+    """
+    costs = frame['Quantity'].astype(float).fillna(0) * frame['Price per unit'].astype(float).fillna(0)
+    statuses = ORDER_STATUSES[1:]
+    # The furthest flag set wins, as in line_status()
+    keys = {"total": pd.Series("All", index=frame.index), "status": pd.Series(np.select(
+        [frame[col].fillna(False).astype(bool) for col in reversed(statuses)], list(reversed(statuses)), ORDER_STATUSES[0]
+    ), index=frame.index)}
+    for dimension, field in SPEND_DIMENSIONS.items():
+        if field != "Status":
+            values = frame[field] if field in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+            keys[dimension] = values.astype(object).where(values.notna() & (values != ""), "N/A").astype(str)
+    totals = [
+        costs.groupby(key.to_numpy(), sort=False).agg(total='sum', lines='size').rename_axis('key').reset_index()
+            .assign(dimension=dimension)
+        for dimension, key in keys.items()
+    ]
+    return pd.concat(totals, ignore_index=True)[["dimension", "key", "total", "lines"]]
+
+def summarize_order(items):
+    # Manifest fields for an archived order, so the list view never needs its lines
+    location_totals = {}
+    total = 0.0
+    for item in items:
+        cost = line_cost(item)
+        total += cost
+        location = item.get('Location') or 'N/A'
+        location_totals[location] = location_totals.get(location, 0.0) + cost
+    status = "Open"
+    for candidate in ORDER_STATUSES[1:]:
+        if items and all(item.get(candidate) for item in items):
+            status = candidate
+    return {
+        "item_count": len(items),
+        "total": total,
+        "status": status,
+        "location_totals": location_totals,
+    }
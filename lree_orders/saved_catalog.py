@@ -0,0 +1,104 @@
+"""On-disk copy of the last ingested catalog and its indexes, for instant cold starts.
+
+Each saved catalog is a directory under CATALOG_CACHE_DIR named by file hash:
+the catalog as Parquet, the facet index arrays as .npy files that are
+memory-mapped on load, and the search index pickled and only read on the
+first text search. `latest.json` names the most recently saved catalog.
+"""
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .catalog import TEXT_FILTER_COLUMNS, FacetIndex, SearchIndex
+
+CATALOG_CACHE_DIR = "catalog_cache"
+CATALOG_CACHE_KEEP = 2  # Saved catalogs kept on disk, newest first
+LATEST_FILE = "latest.json"
+
+def _catalog_dir(file_hash):
+    return os.path.join(CATALOG_CACHE_DIR, file_hash)
+
+def save_catalog(file_hash, file_name, df, facet_index):
+    """Write a catalog and its indexes, then make it the latest; a no-op if already saved."""
+    target = _catalog_dir(file_hash)
+    if not os.path.isdir(target):
+        # Written to a scratch directory and renamed, so readers never see a partial catalog
+        scratch = f"{target}.{os.getpid()}.tmp"
+        shutil.rmtree(scratch, ignore_errors=True)
+        os.makedirs(scratch)
+        df.to_parquet(os.path.join(scratch, "catalog.parquet"), index=False)
+        columns = list(facet_index.codes)
+        for i, column in enumerate(columns):
+            for kind in ("codes", "order", "bounds"):
+                np.save(os.path.join(scratch, f"{kind}_{i}.npy"), getattr(facet_index, kind)[column])
+        with open(os.path.join(scratch, "facet.pkl"), 'wb') as f:
+            pickle.dump({"num_rows": facet_index.num_rows, "columns": columns,
+                         "values": {column: list(facet_index.values[column]) for column in columns}}, f)
+        search = facet_index.search
+        with open(os.path.join(scratch, "search.pkl"), 'wb') as f:
+            pickle.dump({"folded": search.folded, "tokens": search.tokens, "grams": search.grams}, f)
+        try:
+            os.rename(scratch, target)
+        except OSError:
+            shutil.rmtree(scratch, ignore_errors=True)  # Saved meanwhile by another process
+            if not os.path.isdir(target):
+                raise
+
+    latest = os.path.join(CATALOG_CACHE_DIR, LATEST_FILE)
+    with open(latest + ".tmp", 'w') as f:
+        json.dump({"file_hash": file_hash, "file_name": file_name}, f)
+    os.replace(latest + ".tmp", latest)
+    _prune(file_hash)
+
+def _prune(keep_hash):
+    saved = [entry for entry in os.scandir(CATALOG_CACHE_DIR)
+             if entry.is_dir() and not entry.name.endswith(".tmp") and entry.name != keep_hash]
+    saved.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in saved[CATALOG_CACHE_KEEP - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+def latest_saved_catalog():
+    """(file_hash, file_name) of the most recently saved catalog, or None."""
+    try:
+        with open(os.path.join(CATALOG_CACHE_DIR, LATEST_FILE)) as f:
+            latest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.isdir(_catalog_dir(latest["file_hash"])):
+        return None
+    return latest["file_hash"], latest["file_name"]
+
+def load_saved_catalog(file_hash):
+    path = os.path.join(_catalog_dir(file_hash), "catalog.parquet")
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def load_saved_facet_index(file_hash):
+    """The saved FacetIndex for a catalog with its arrays memory-mapped, or None if not saved."""
+    directory = _catalog_dir(file_hash)
+    try:
+        with open(os.path.join(directory, "facet.pkl"), 'rb') as f:
+            meta = pickle.load(f)
+    except OSError:
+        return None
+    arrays = {kind: {} for kind in ("codes", "order", "bounds")}
+    for i, column in enumerate(meta["columns"]):
+        for kind in arrays:
+            arrays[kind][column] = np.load(os.path.join(directory, f"{kind}_{i}.npy"), mmap_mode='r')
+    values = {column: pd.Index(column_values, dtype=object) for column, column_values in meta["values"].items()}
+
+    def load_search():
+        try:
+            with open(os.path.join(directory, "search.pkl"), 'rb') as f:
+                return SearchIndex(**pickle.load(f))
+        except OSError:
+            # Pruned since the index was opened (the arrays stay readable through their maps): rebuild
+            return SearchIndex.build(facet_index, [col for col in TEXT_FILTER_COLUMNS if col in facet_index.values])
+
+    facet_index = FacetIndex(meta["num_rows"], arrays["codes"], values, arrays["order"], arrays["bounds"], load_search)
+    return facet_index
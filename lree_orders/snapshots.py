@@ -0,0 +1,91 @@
+"""Versioned stock snapshots stored as per-Part ATC changes."""
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .store import connect_orders_db, write_transaction
+
+def stock_file_date(file_name):
+    # Stock files are named like "30-07-2025 Refurb Stock File.csv"
+    match = re.search(r'(\d{2})-(\d{2})-(\d{4})', file_name or "")
+    if not match:
+        return None
+    day, month, year = match.groups()
+    return f"{year}-{month}-{day}"
+
+def _stock_as_of(conn, snapshot_id, parts=None):
+    # Part -> ATC as of a snapshot, rebuilt from the latest change per part
+    sql = """
+        SELECT c.part, c.atc FROM stock_changes c
+        JOIN (SELECT part, MAX(snapshot_id) AS sid FROM stock_changes WHERE snapshot_id <= ? GROUP BY part) latest
+          ON c.part = latest.part AND c.snapshot_id = latest.sid
+        WHERE c.atc IS NOT NULL
+    """
+    state = pd.read_sql_query(sql, conn, params=(snapshot_id,)).set_index('part')['atc']
+    return state if parts is None else state[state.index.isin(parts)]
+
+def record_stock_snapshot(file_hash, file_name, part_atc):
+    """Store a stock file as a diff against the latest snapshot and return its snapshot_id."""
+    conn = connect_orders_db()
+    row = conn.execute("SELECT snapshot_id FROM stock_snapshots WHERE file_hash = ?", (file_hash,)).fetchone()
+    if row:
+        conn.close()
+        return row[0]
+    with write_transaction(conn):
+        # Another session may have recorded the same file while this one waited for the lock
+        row = conn.execute("SELECT snapshot_id FROM stock_snapshots WHERE file_hash = ?", (file_hash,)).fetchone()
+        if row:
+            snapshot_id = row[0]
+        else:
+            latest_id = conn.execute("SELECT COALESCE(MAX(snapshot_id), 0) FROM stock_snapshots").fetchone()[0]
+            previous = _stock_as_of(conn, latest_id)
+            merged = pd.concat([previous.rename('old'), part_atc.rename('new')], axis=1)
+            changed = merged[merged['old'].ne(merged['new'])]
+            cursor = conn.execute(
+                "INSERT INTO stock_snapshots (file_hash, file_name, file_date, ingested_at, part_count) VALUES (?, ?, ?, ?, ?)",
+                (file_hash, file_name, stock_file_date(file_name), datetime.now().isoformat(timespec='seconds'), len(part_atc))
+            )
+            snapshot_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO stock_changes (snapshot_id, part, atc) VALUES (?, ?, ?)",
+                [(snapshot_id, part, None if pd.isna(atc) else int(atc)) for part, atc in changed['new'].items()]
+            )
+    conn.close()
+    return snapshot_id
+
+def previous_snapshot_id(snapshot_id):
+    conn = connect_orders_db()
+    row = conn.execute("SELECT MAX(snapshot_id) FROM stock_snapshots WHERE snapshot_id < ?", (snapshot_id,)).fetchone()
+    conn.close()
+    return row[0]
+
+def stock_diff(from_snapshot, to_snapshot):
+    """Per-Part ATC differences between two snapshots (either order; None means empty stock)."""
+    low, high = sorted((from_snapshot or 0, to_snapshot or 0))
+    conn = connect_orders_db()
+    parts = [row[0] for row in conn.execute(
+        "SELECT DISTINCT part FROM stock_changes WHERE snapshot_id > ? AND snapshot_id <= ?", (low, high)
+    )]
+    before = _stock_as_of(conn, from_snapshot or 0, parts)
+    after = _stock_as_of(conn, to_snapshot or 0, parts)
+    conn.close()
+    diff = pd.concat([before.rename('Previous ATC'), after.rename('New ATC')], axis=1)
+    diff = diff[diff['Previous ATC'].ne(diff['New ATC'])]
+    diff['Change'] = np.select(
+        [diff['Previous ATC'].isna(), diff['New ATC'].isna()], ["added", "removed"], default="ATC changed"
+    )
+    return diff.rename_axis('Part').reset_index()
+
+def atc_history(part):
+    # ATC of one Part at every snapshot, by file date where the name carries one
+    conn = connect_orders_db()
+    history = pd.read_sql_query("""
+        SELECT COALESCE(s.file_date, s.ingested_at) AS "Stock File",
+               (SELECT c.atc FROM stock_changes c WHERE c.part = ? AND c.snapshot_id <= s.snapshot_id
+                ORDER BY c.snapshot_id DESC LIMIT 1) AS ATC
+        FROM stock_snapshots s ORDER BY s.snapshot_id
+    """, conn, params=(part,))
+    conn.close()
+    return history.set_index('Stock File')['ATC']
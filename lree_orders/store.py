@@ -0,0 +1,629 @@
+"""SQLite storage for the current order, archived orders and stock history.
+
+All tables live in one database file, ORDERS_DB_FILE. Every write touches
+only the rows it changes and commits as one transaction.
+
+Several sessions (and processes, such as the batch CLI) may write at once.
+The database runs in WAL mode so readers never block the writer, each
+write transaction takes the write lock up front, and every write bumps a
+change counter (see change_versions()) that sessions poll to reload only
+what another session changed. Archived orders also carry a version, so an
+update based on a stale copy is refused instead of overwriting newer edits.
+"""
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .orders import (
+    ASSET_COLUMNS, ORDER_LINE_COLUMNS, ORDER_TRANSIENT_COLUMNS, line_status, order_frame, plain_value,
+    spend_buckets, summarize_order
+)
+from .validation import reserved_quantities
+
+ORDERS_DB_FILE = "orders.db"
+ORDERS_DB_TIMEOUT = 30  # Seconds a writer waits for another session's transaction to finish
+# Files written by earlier versions, imported once on first start
+CURRENT_ORDER_FILE = "current_order.csv"
+PAST_ORDERS_FILE = "past_orders.json"
+
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.float64, float)
+sqlite3.register_adapter(np.bool_, bool)
+sqlite3.register_converter("BOOLEAN", lambda value: value not in (b"0", b""))
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+class OrderConflictError(Exception):
+    """An archived order was changed or deleted by someone else since it was read."""
+
+    def __init__(self, order_id=None):
+        # order_id None stands for the current order
+        what = f"Order {order_id}" if order_id is not None else "The current order"
+        super().__init__(f"{what} was changed by another session.")
+        self.order_id = order_id
+
+def connect_orders_db():
+    conn = sqlite3.connect(ORDERS_DB_FILE, timeout=ORDERS_DB_TIMEOUT, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+@contextmanager
+def write_transaction(conn):
+    """Run a block as one write transaction, committed on success and rolled back on error.
+
+    BEGIN IMMEDIATE takes the write lock before any reads, so read-modify-write
+    sequences cannot interleave with another writer. Inside an open transaction
+    the block runs as a savepoint instead: only the outermost call commits, and
+    an error undoes just the nested block's writes.
+    """
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT nested_write")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO nested_write")
+            conn.execute("RELEASE nested_write")
+            raise
+        conn.execute("RELEASE nested_write")
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def _bump_version(conn, name):
+    conn.execute(
+        "INSERT INTO store_versions (name, version) VALUES (?, 1) "
+        "ON CONFLICT (name) DO UPDATE SET version = version + 1", (name,)
+    )
+    return conn.execute("SELECT version FROM store_versions WHERE name = ?", (name,)).fetchone()[0]
+
+def change_versions():
+    """Current change counter per table group ('current_order', 'past_orders'); 0 if never written."""
+    conn = connect_orders_db()
+    versions = dict(conn.execute("SELECT name, version FROM store_versions").fetchall())
+    conn.close()
+    return {name: versions.get(name, 0) for name in ("current_order", "past_orders")}
+
+def init_orders_db():
+    """Create any missing tables and import files left by earlier versions."""
+    columns = ", ".join(f"{_quote(col)} {sql_type}" for col, sql_type in ORDER_LINE_COLUMNS.items())
+    conn = connect_orders_db()
+    conn.execute("PRAGMA journal_mode = WAL")  # Persistent: readers no longer wait for writers
+    with conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS current_order (line_id INTEGER PRIMARY KEY AUTOINCREMENT, {columns}, extra TEXT)")
+        # Past orders: a small manifest row per order, with the line items stored separately
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS past_orders (
+                order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                archived_at TEXT,
+                item_count INTEGER NOT NULL,
+                total REAL NOT NULL,
+                status TEXT NOT NULL,
+                location_totals TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE IF NOT EXISTS past_order_lines (
+                order_id INTEGER PRIMARY KEY REFERENCES past_orders(order_id) ON DELETE CASCADE,
+                lines TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS past_orders_archived_at ON past_orders (archived_at);
+            CREATE INDEX IF NOT EXISTS past_orders_status ON past_orders (status);
+            CREATE TABLE IF NOT EXISTS stock_snapshots (
+                snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_hash TEXT NOT NULL UNIQUE,
+                file_name TEXT,
+                file_date TEXT,
+                ingested_at TEXT NOT NULL,
+                part_count INTEGER NOT NULL
+            );
+            -- Each snapshot stores only the parts whose ATC differs from the snapshot before it (NULL = removed)
+            CREATE TABLE IF NOT EXISTS stock_changes (
+                snapshot_id INTEGER NOT NULL,
+                part TEXT NOT NULL,
+                atc INTEGER,
+                PRIMARY KEY (snapshot_id, part)
+            );
+            CREATE INDEX IF NOT EXISTS stock_changes_part ON stock_changes (part, snapshot_id);
+            CREATE TABLE IF NOT EXISTS past_order_reservations (
+                order_id INTEGER NOT NULL,
+                part TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                PRIMARY KEY (order_id, part)
+            );
+            -- Only units that have had a field entered get a row; the rest are implied by the line's quantity
+            CREATE TABLE IF NOT EXISTS past_order_assets (
+                order_id INTEGER NOT NULL,
+                line_index INTEGER NOT NULL,
+                unit_index INTEGER NOT NULL,
+                serial TEXT,
+                received BOOLEAN NOT NULL DEFAULT 0,
+                current_owner TEXT,
+                PRIMARY KEY (order_id, line_index, unit_index)
+            );
+            CREATE INDEX IF NOT EXISTS past_order_assets_serial ON past_order_assets (serial) WHERE serial IS NOT NULL;
+            -- Running spend totals, adjusted by every write so dashboards never scan line items
+            CREATE TABLE IF NOT EXISTS spend_totals (
+                scope TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                total REAL NOT NULL,
+                lines INTEGER NOT NULL,
+                PRIMARY KEY (scope, dimension, key)
+            );
+            -- Searchable fields of every archived line, so lines can be found across orders without
+            -- reading each order's lines; one index per field that is searched on
+            CREATE TABLE IF NOT EXISTS past_order_line_index (
+                order_id INTEGER NOT NULL,
+                line_index INTEGER NOT NULL,
+                part TEXT COLLATE NOCASE,
+                description TEXT,
+                hardware_dri TEXT COLLATE NOCASE,
+                location TEXT COLLATE NOCASE,
+                status TEXT NOT NULL,
+                quantity INTEGER,
+                PRIMARY KEY (order_id, line_index)
+            );
+            CREATE INDEX IF NOT EXISTS past_order_line_index_part ON past_order_line_index (part);
+            CREATE INDEX IF NOT EXISTS past_order_line_index_dri ON past_order_line_index (hardware_dri, location);
+            CREATE INDEX IF NOT EXISTS past_order_line_index_location ON past_order_line_index (location, status);
+            CREATE INDEX IF NOT EXISTS past_order_line_index_status ON past_order_line_index (status);
+            CREATE TABLE IF NOT EXISTS store_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        """)
+    # Migrations and one-off imports run under the write lock, so concurrent starts do them once
+    with write_transaction(conn):
+        if "version" not in {row['name'] for row in conn.execute("PRAGMA table_info(past_orders)")}:
+            conn.execute("ALTER TABLE past_orders ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        # One-time backfills for databases from earlier versions, in order. PRAGMA user_version
+        # counts those already run, so later starts skip them instead of rescanning the archive.
+        backfills = [backfill_reservations, backfill_line_index, backfill_spend_totals, drop_current_spend]
+        done = conn.execute("PRAGMA user_version").fetchone()[0]
+        if done < len(backfills):
+            for backfill in backfills[done:]:
+                backfill(conn)
+            conn.execute(f"PRAGMA user_version = {len(backfills)}")
+        imported = [migrate_current_order_csv(conn), migrate_past_orders_json(conn)]
+    # Legacy files are retired only once everything read from them is committed
+    for path in filter(None, imported):
+        os.replace(path, path + ".imported")
+    conn.close()
+
+# --- Current Order ---
+def _split_line(item):
+    typed = {col: plain_value(item.get(col)) for col in ORDER_LINE_COLUMNS}
+    extra = {col: plain_value(value) for col, value in item.items()
+             if col not in ORDER_LINE_COLUMNS and col not in ORDER_TRANSIENT_COLUMNS}
+    return typed, json.dumps(extra)
+
+def _line_item(row):
+    item = dict(row)
+    item.update(json.loads(item.pop('extra') or '{}'))
+    return item
+
+def insert_order_lines(items, conn=None):
+    # Assigns each item its stable `line_id` in place
+    own_conn = conn is None
+    conn = conn or connect_orders_db()
+    placeholders = ", ".join("?" for _ in ORDER_LINE_COLUMNS)
+    columns = ", ".join(_quote(col) for col in ORDER_LINE_COLUMNS)
+    with write_transaction(conn):
+        for item in items:
+            typed, extra = _split_line(item)
+            cursor = conn.execute(
+                f"INSERT INTO current_order ({columns}, extra) VALUES ({placeholders}, ?)",
+                [*typed.values(), extra]
+            )
+            item['line_id'] = cursor.lastrowid
+        version = _bump_version(conn, "current_order")
+    if own_conn:
+        conn.close()
+    return version
+
+def update_order_lines(changes):
+    # `changes` maps line_id -> {column: new value}; untyped columns are ignored.
+    # Lines deleted meanwhile by another session are skipped. Returns the new current_order version,
+    # or None if no line was changed (the version is then left alone, so other sessions do not reload).
+    conn = connect_orders_db()
+    with write_transaction(conn):
+        updated = 0
+        for line_id, values in changes.items():
+            values = {col: plain_value(value) for col, value in values.items() if col in ORDER_LINE_COLUMNS}
+            if values:
+                assignments = ", ".join(f"{_quote(col)} = ?" for col in values)
+                updated += conn.execute(
+                    f"UPDATE current_order SET {assignments} WHERE line_id = ?", [*values.values(), line_id]
+                ).rowcount
+        version = _bump_version(conn, "current_order") if updated else None
+    conn.close()
+    return version
+
+def delete_order_lines(line_ids):
+    conn = connect_orders_db()
+    with write_transaction(conn):
+        conn.executemany("DELETE FROM current_order WHERE line_id = ?", [(line_id,) for line_id in line_ids])
+        version = _bump_version(conn, "current_order")
+    conn.close()
+    return version
+
+def clear_current_order():
+    conn = connect_orders_db()
+    with write_transaction(conn):
+        conn.execute("DELETE FROM current_order")
+        version = _bump_version(conn, "current_order")
+    conn.close()
+    return version
+
+def archive_current_order(name, expected_version=None):
+    """Archive the stored current order and clear it in one transaction.
+
+    With `expected_version` (the current_order version the caller's copy reflects),
+    raises OrderConflictError instead if another session has changed the order since.
+    Returns (past order manifest entry, new current_order version).
+    """
+    conn = connect_orders_db()
+    try:
+        with write_transaction(conn):
+            row = conn.execute("SELECT version FROM store_versions WHERE name = 'current_order'").fetchone()
+            if expected_version is not None and (row[0] if row else 0) != expected_version:
+                raise OrderConflictError()
+            items = [
+                {col: value for col, value in _line_item(line).items() if col != 'line_id'}
+                for line in conn.execute("SELECT * FROM current_order ORDER BY line_id")
+            ]
+            entry = archive_order(name, items, conn=conn)
+            conn.execute("DELETE FROM current_order")
+            version = _bump_version(conn, "current_order")
+    finally:
+        conn.close()
+    return entry, version
+
+def load_current_order():
+    conn = connect_orders_db()
+    rows = conn.execute("SELECT * FROM current_order ORDER BY line_id").fetchall()
+    conn.close()
+    return order_frame([_line_item(row) for row in rows])
+
+def migrate_current_order_csv(conn):
+    # One-off import of the order file written by earlier versions; returns the file to retire
+    if not os.path.exists(CURRENT_ORDER_FILE):
+        return None
+    if conn.execute("SELECT COUNT(*) FROM current_order").fetchone()[0] == 0:
+        df = pd.read_csv(CURRENT_ORDER_FILE)
+        for col in ["Approved", "Delivered", "Transferred"]:
+            if col in df.columns:
+                df[col] = df[col].fillna(False).astype(bool)
+        for col in ["Quantity", "Price per unit", "ATC"]:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        for col in ["Hardware DRI", "Part", "1-line Justification"]:
+            if col in df.columns:
+                df[col] = df[col].fillna('').astype(str)
+        insert_order_lines(df.to_dict('records'), conn)
+    return CURRENT_ORDER_FILE
+
+# --- Past Orders ---
+def _manifest_entry(row):
+    entry = dict(row)
+    entry['location_totals'] = json.loads(entry['location_totals'])
+    return entry
+
+def _dump_lines(items):
+    return json.dumps(items, default=plain_value)
+
+def archive_order(name, items, archived_at=None, conn=None):
+    own_conn = conn is None
+    conn = conn or connect_orders_db()
+    summary = summarize_order(items)
+    if archived_at is None:
+        archived_at = datetime.now().isoformat(timespec='seconds')
+    with write_transaction(conn):
+        cursor = conn.execute(
+            "INSERT INTO past_orders (name, archived_at, item_count, total, status, location_totals) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, archived_at, summary['item_count'], summary['total'], summary['status'], json.dumps(summary['location_totals']))
+        )
+        order_id = cursor.lastrowid
+        conn.execute("INSERT INTO past_order_lines (order_id, lines) VALUES (?, ?)", (order_id, _dump_lines(items)))
+        _write_reservations(conn, order_id, items)
+        _write_line_index(conn, order_id, items)
+        _adjust_spend(conn, "archive", items)
+        _bump_version(conn, "past_orders")
+        row = conn.execute("SELECT * FROM past_orders WHERE order_id = ?", (order_id,)).fetchone()
+    if own_conn:
+        conn.close()
+    return _manifest_entry(row)
+
+def _check_version(conn, order_id, expected_version):
+    row = conn.execute("SELECT version FROM past_orders WHERE order_id = ?", (order_id,)).fetchone()
+    if row is None or (expected_version is not None and row['version'] != expected_version):
+        raise OrderConflictError(order_id)
+
+def update_past_order(order_id, items, expected_version=None):
+    # Rewrites only this order's lines and manifest row. With `expected_version` (the version the
+    # items were read at), raises OrderConflictError instead of overwriting a newer save.
+    summary = summarize_order(items)
+    conn = connect_orders_db()
+    try:
+        with write_transaction(conn):
+            _check_version(conn, order_id, expected_version)
+            _adjust_spend(conn, "archive", _stored_past_lines(conn, order_id), sign=-1)
+            _adjust_spend(conn, "archive", items)
+            conn.execute(
+                "UPDATE past_orders SET item_count = ?, total = ?, status = ?, location_totals = ?, version = version + 1 "
+                "WHERE order_id = ?",
+                (summary['item_count'], summary['total'], summary['status'], json.dumps(summary['location_totals']), order_id)
+            )
+            conn.execute("UPDATE past_order_lines SET lines = ? WHERE order_id = ?", (_dump_lines(items), order_id))
+            _write_reservations(conn, order_id, items)
+            _write_line_index(conn, order_id, items)
+            # Lines are addressed by position, so assets of lines past the end go with them, as do
+            # units past a line's (possibly lowered) Quantity
+            conn.execute(
+                "DELETE FROM past_order_assets WHERE order_id = ? AND (line_index >= ? OR unit_index >= ("
+                "SELECT COALESCE(i.quantity, 0) FROM past_order_line_index i "
+                "WHERE i.order_id = past_order_assets.order_id AND i.line_index = past_order_assets.line_index))",
+                (order_id, len(items))
+            )
+            _bump_version(conn, "past_orders")
+            row = conn.execute("SELECT * FROM past_orders WHERE order_id = ?", (order_id,)).fetchone()
+    finally:
+        conn.close()
+    return _manifest_entry(row)
+
+def delete_past_order(order_id, expected_version=None):
+    conn = connect_orders_db()
+    try:
+        with write_transaction(conn):
+            if expected_version is not None:
+                _check_version(conn, order_id, expected_version)
+            _adjust_spend(conn, "archive", _stored_past_lines(conn, order_id), sign=-1)
+            conn.execute("DELETE FROM past_order_lines WHERE order_id = ?", (order_id,))
+            conn.execute("DELETE FROM past_order_reservations WHERE order_id = ?", (order_id,))
+            conn.execute("DELETE FROM past_order_assets WHERE order_id = ?", (order_id,))
+            conn.execute("DELETE FROM past_order_line_index WHERE order_id = ?", (order_id,))
+            conn.execute("DELETE FROM past_orders WHERE order_id = ?", (order_id,))
+            _bump_version(conn, "past_orders")
+    finally:
+        conn.close()
+
+def _past_orders_filter(name=None, date_from=None, date_to=None, statuses=None):
+    clauses, params = [], []
+    if name:
+        clauses.append("name LIKE ? ESCAPE '\\'")
+        params.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    if date_from:
+        clauses.append("archived_at >= ?")
+        params.append(date_from.isoformat())
+    if date_to:
+        clauses.append("archived_at < date(?, '+1 day')")
+        params.append(date_to.isoformat())
+    if statuses:
+        clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+def count_past_orders(**filters):
+    where, params = _past_orders_filter(**filters)
+    conn = connect_orders_db()
+    total = conn.execute(f"SELECT COUNT(*) FROM past_orders{where}", params).fetchone()[0]
+    conn.close()
+    return total
+
+def query_past_orders(limit, offset=0, **filters):
+    # One page of manifest entries, newest first; line items are read per order with load_past_order_lines()
+    where, params = _past_orders_filter(**filters)
+    conn = connect_orders_db()
+    rows = conn.execute(
+        f"SELECT * FROM past_orders{where} ORDER BY order_id DESC LIMIT ? OFFSET ?", [*params, limit, offset]
+    ).fetchall()
+    conn.close()
+    return [_manifest_entry(row) for row in rows]
+
+def _stored_past_lines(conn, order_id):
+    row = conn.execute("SELECT lines FROM past_order_lines WHERE order_id = ?", (order_id,)).fetchone()
+    return json.loads(row['lines']) if row else []
+
+def load_past_order_lines(order_id):
+    conn = connect_orders_db()
+    lines = _stored_past_lines(conn, order_id)
+    conn.close()
+    return lines
+
+def migrate_past_orders_json(conn):
+    # One-off import of the monolithic archive written by earlier versions; returns the file to retire
+    if not os.path.exists(PAST_ORDERS_FILE):
+        return None
+    if conn.execute("SELECT COUNT(*) FROM past_orders").fetchone()[0] == 0:
+        with open(PAST_ORDERS_FILE, 'r') as f:
+            past_orders = json.load(f)
+        for order in past_orders:
+            items = order.get('order', [])
+            for item in items:
+                for col in ["Approved", "Delivered", "Transferred"]:
+                    if col in item:
+                        item[col] = bool(item[col])
+            archive_order(order['name'], items, archived_at=order.get('archived_at', ''), conn=conn)
+    return PAST_ORDERS_FILE
+
+# --- Reservations ---
+def _write_reservations(conn, order_id, items):
+    conn.execute("DELETE FROM past_order_reservations WHERE order_id = ?", (order_id,))
+    conn.executemany(
+        "INSERT INTO past_order_reservations (order_id, part, quantity) VALUES (?, ?, ?)",
+        [(order_id, part, quantity) for part, quantity in reserved_quantities(items).items()]
+    )
+
+def backfill_reservations(conn):
+    # Archives created before reservations were tracked get theirs computed once
+    missing = conn.execute(
+        "SELECT order_id FROM past_orders WHERE order_id NOT IN (SELECT DISTINCT order_id FROM past_order_reservations)"
+    ).fetchall()
+    for (order_id,) in missing:
+        row = conn.execute("SELECT lines FROM past_order_lines WHERE order_id = ?", (order_id,)).fetchone()
+        if row:
+            _write_reservations(conn, order_id, json.loads(row[0]))
+
+def load_reservations():
+    """Return a Series of quantity reserved per Part by archived orders."""
+    conn = connect_orders_db()
+    reserved = pd.read_sql_query(
+        "SELECT part AS Part, SUM(quantity) AS Reserved FROM past_order_reservations GROUP BY part", conn
+    )
+    conn.close()
+    return reserved.set_index('Part')['Reserved']
+
+# --- Archived Line Search ---
+def _write_line_index(conn, order_id, items):
+    conn.execute("DELETE FROM past_order_line_index WHERE order_id = ?", (order_id,))
+    conn.executemany(
+        "INSERT INTO past_order_line_index "
+        "(order_id, line_index, part, description, hardware_dri, location, status, quantity) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(order_id, line_index, plain_value(item.get('Part')), plain_value(item.get('Description')),
+          (plain_value(item.get('Hardware DRI')) or None), plain_value(item.get('Location')), line_status(item),
+          plain_value(item.get('Quantity')))
+         for line_index, item in enumerate(items)]
+    )
+
+def backfill_line_index(conn):
+    # Archives created before line search existed get indexed once
+    missing = conn.execute(
+        "SELECT order_id, lines FROM past_order_lines "
+        "WHERE order_id NOT IN (SELECT DISTINCT order_id FROM past_order_line_index)"
+    ).fetchall()
+    for order_id, lines in missing:
+        _write_line_index(conn, order_id, json.loads(lines))
+
+def search_past_lines(parts=None, hardware_dris=None, locations=None, statuses=None, limit=1000):
+    """Archived lines matching every given field (any of the values within a field), newest order first.
+
+    Matching is exact and case-insensitive. Returns (total matches, DataFrame of up to `limit` lines).
+    """
+    clauses, params = [], []
+    for column, values in (("part", parts), ("hardware_dri", hardware_dris), ("location", locations), ("status", statuses)):
+        if values:
+            clauses.append(f"i.{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = connect_orders_db()
+    total = conn.execute(f"SELECT COUNT(*) FROM past_order_line_index i{where}", params).fetchone()[0]
+    lines = pd.read_sql_query(
+        "SELECT i.order_id, o.name AS \"Order\", o.archived_at AS Archived, i.line_index + 1 AS Line, "
+        "i.part AS Part, i.description AS Description, i.quantity AS Quantity, i.hardware_dri AS \"Hardware DRI\", "
+        "i.location AS Location, i.status AS Status "
+        f"FROM past_order_line_index i JOIN past_orders o ON o.order_id = i.order_id{where} "
+        "ORDER BY i.order_id DESC, i.line_index LIMIT ?",
+        conn, params=[*params, limit]
+    )
+    conn.close()
+    return total, lines
+
+def past_line_values(column):
+    """Distinct values of an indexed line field ('hardware_dri', 'location'), for search pickers."""
+    conn = connect_orders_db()
+    values = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT {column} FROM past_order_line_index WHERE {column} IS NOT NULL ORDER BY {column}"
+    )]
+    conn.close()
+    return values
+
+# --- Spend Totals ---
+def _adjust_spend(conn, scope, items, sign=1):
+    # Adds (sign=1) or takes back (sign=-1) the spend of these lines in every bucket they count towards
+    deltas = spend_buckets(items, sign)
+    if not deltas:
+        return
+    conn.executemany(
+        "INSERT INTO spend_totals (scope, dimension, key, total, lines) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (scope, dimension, key) DO UPDATE SET total = total + excluded.total, lines = lines + excluded.lines",
+        [(scope, dimension, key, total, lines) for (dimension, key), (total, lines) in deltas.items()]
+    )
+    conn.execute("DELETE FROM spend_totals WHERE scope = ? AND lines <= 0", (scope,))
+
+def backfill_spend_totals(conn):
+    # Databases from before spend totals existed get them computed once from the stored lines
+    if conn.execute("SELECT 1 FROM spend_totals LIMIT 1").fetchone():
+        return
+    for (lines,) in conn.execute("SELECT lines FROM past_order_lines").fetchall():
+        _adjust_spend(conn, "archive", json.loads(lines))
+
+def drop_current_spend(conn):
+    # Earlier versions also kept totals for the current order, which are no longer maintained
+    conn.execute("DELETE FROM spend_totals WHERE scope = 'current'")
+
+def load_spend_totals(scope=None):
+    """Spend per (scope, dimension, key); scope is 'archive', dimension 'total' or a SPEND_DIMENSIONS key.
+
+    The current order changes with every edit, so its spend is summed from its lines (orders.order_spend).
+    """
+    conn = connect_orders_db()
+    totals = pd.read_sql_query(
+        "SELECT scope, dimension, key, total, lines FROM spend_totals" + (" WHERE scope = ?" if scope else ""),
+        conn, params=(scope,) if scope else None
+    )
+    conn.close()
+    return totals
+
+# --- Asset Tracking ---
+def load_line_assets(order_id, line_index, units):
+    """One row per unit of an archived line, with S/N, Received and Current Owner filled in where recorded."""
+    conn = connect_orders_db()
+    rows = conn.execute(
+        "SELECT unit_index, serial, received, current_owner FROM past_order_assets "
+        "WHERE order_id = ? AND line_index = ? AND unit_index < ?", (order_id, line_index, units)
+    ).fetchall()
+    conn.close()
+    assets = pd.DataFrame({
+        "Unit": np.arange(1, units + 1),
+        "S/N": pd.Series([None] * units, dtype=object),
+        "Received": np.zeros(units, dtype=bool),
+        "Current Owner": pd.Series([None] * units, dtype=object),
+    })
+    for row in rows:
+        assets.loc[row['unit_index'], ["S/N", "Received", "Current Owner"]] = [row['serial'], row['received'], row['current_owner']]
+    return assets
+
+def update_line_assets(order_id, line_index, changes):
+    # `changes` maps unit_index -> {display column: new value}; only those units' rows are written
+    conn = connect_orders_db()
+    with write_transaction(conn):
+        for unit_index, values in changes.items():
+            values = {ASSET_COLUMNS[col]: plain_value(value) for col, value in values.items() if col in ASSET_COLUMNS}
+            if not values:
+                continue
+            if 'serial' in values:
+                values['serial'] = str(values['serial'] or '').strip() or None
+            if 'received' in values:
+                values['received'] = bool(values['received'])
+            columns = ", ".join(values)
+            assignments = ", ".join(f"{col} = excluded.{col}" for col in values)
+            conn.execute(
+                f"INSERT INTO past_order_assets (order_id, line_index, unit_index, {columns}) "
+                f"VALUES (?, ?, ?, {', '.join('?' for _ in values)}) "
+                f"ON CONFLICT (order_id, line_index, unit_index) DO UPDATE SET {assignments}",
+                [order_id, line_index, int(unit_index), *values.values()]
+            )
+    conn.close()
+
+def find_serial(serial):
+    """Every archived unit recorded with this serial number, with its order and line."""
+    conn = connect_orders_db()
+    rows = conn.execute(
+        "SELECT a.order_id, o.name, a.line_index, a.unit_index, a.received, a.current_owner, i.part, i.description "
+        "FROM past_order_assets a JOIN past_orders o ON o.order_id = a.order_id "
+        "LEFT JOIN past_order_line_index i ON i.order_id = a.order_id AND i.line_index = a.line_index "
+        "WHERE a.serial = ? ORDER BY a.order_id", (serial.strip(),)
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
@@ -0,0 +1,82 @@
+"""Per-rerun timing spans, appended to a JSON-lines trace file."""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+_write_lock = threading.Lock()
+
+def frame_bytes(df):
+    """In-memory size of a frame's columns, as a proxy for what is serialized to the browser."""
+    return int(df.memory_usage(index=False, deep=False).sum())
+
+class RerunTrace:
+    """Spans collected over one script run and written out as one trace record.
+
+    Spans recorded by widget callbacks (which run before the script) and by a
+    run cut short with st.rerun() are carried into the next completed run's
+    record, so each record covers one full user interaction.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.spans = []
+        self.started = None
+        self.last = None  # The previous finished record, for the debug panel
+
+    def begin(self):
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """Time a block; the caller may add rows/bytes to the yielded dict inside it."""
+        record = {"stage": stage, **fields}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self.spans.append(record)
+
+    def finish(self, trace_file=None):
+        # The whole script run is itself a span, so reruns aggregate like any other stage
+        if self.started is not None:
+            self.spans.append({"stage": "rerun", "seconds": time.perf_counter() - self.started})
+        record = {
+            "session": self.session_id,
+            "finished_at": datetime.now().isoformat(timespec='milliseconds'),
+            "spans": self.spans,
+        }
+        self.spans = []
+        self.started = None
+        self.last = record
+        if trace_file:
+            line = json.dumps(record, default=str) + "\n"
+            with _write_lock, open(trace_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+        return record
+
+def read_trace(trace_file):
+    """Flatten a trace file into one row per span."""
+    rows = []
+    with open(trace_file, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                rows.extend({"session": record["session"], "finished_at": record["finished_at"], **span}
+                            for span in record["spans"])
+    return pd.DataFrame(rows, columns=["session", "finished_at", "stage", "seconds", "rows", "bytes"])
+
+def summarize_trace(spans):
+    """Count, p50, p95 and max seconds per stage, slowest p95 first."""
+    grouped = spans.groupby('stage')['seconds']
+    summary = pd.DataFrame({
+        "count": grouped.size(),
+        "p50": grouped.quantile(0.5),
+        "p95": grouped.quantile(0.95),
+        "max": grouped.max(),
+    })
+    return summary.sort_values('p95', ascending=False).reset_index()
@@ -0,0 +1,33 @@
+"""Stock validation against catalog ATC and archived-order reservations."""
+import pandas as pd
+
+from .orders import plain_value
+
+RESERVATION_RELEASED_BY = "Delivered"  # Archived lines hold their quantity against ATC until this flag is set
+
+def reserved_quantities(items):
+    # Per-part quantities an archived order still holds against stock
+    reserved = {}
+    for item in items:
+        if not item.get(RESERVATION_RELEASED_BY) and item.get('Part'):
+            reserved[item['Part']] = reserved.get(item['Part'], 0) + int(plain_value(item.get('Quantity')) or 0)
+    return {part: quantity for part, quantity in reserved.items() if quantity}
+
+def refresh_atc(parts, part_atc):
+    """Current ATC for each Part in `parts`, 0 where the part is no longer in the catalog."""
+    return pd.Series(parts, dtype=object).map(part_atc).fillna(0).astype(int)
+
+def validate_stock(order_df, reserved=None):
+    """Compare requested quantities with stock per Part.
+
+    Returns one row per Part with Requested, ATC, Reserved (held by archived
+    orders), Available and an Exceeds flag.
+    """
+    agg = {'Requested': ('Quantity', 'sum'), 'ATC': ('ATC', 'first')}
+    if 'Description' in order_df.columns:
+        agg['Description'] = ('Description', 'first')
+    summary = order_df.groupby('Part', sort=False).agg(**agg)
+    summary['Reserved'] = 0 if reserved is None else summary.index.map(reserved).fillna(0).astype(int)
+    summary['Available'] = (summary['ATC'] - summary['Reserved']).clip(lower=0)
+    summary['Exceeds'] = summary['Requested'] > summary['Available']
+    return summary.reset_index()